@@ -0,0 +1,121 @@
+import time
+import heapq
+
+from typing import Dict, List, Optional, Tuple
+from logging_config import app_logger
+
+logger = app_logger.getChild('adaptive_schedule')
+
+# Weight of the latest run in the posting rate estimate (exponentially weighted moving average)
+RATE_SMOOTHING = 0.3
+# Window used to estimate the posting rate of a search that has never run before
+FIRST_RUN_WINDOW_SECONDS = 24 * 60 * 60
+
+Search = Tuple[str, str]
+
+class AdaptiveSchedule:
+    """
+    A priority queue of searches ordered by their next run time.
+
+    Each search gets an interval from its estimated posting rate (new jobs per hour), so that about
+    target_new_jobs_per_run new jobs are waiting when it runs: busy searches run often, quiet ones
+    rarely, always within [min_interval_seconds, max_interval_seconds]. When the expected credit
+    spend of all searches goes over credit_budget_per_hour, every interval is stretched by the same
+    factor, so credits go where new jobs actually appear.
+
+    The scheduler loop owns it. Searches running as tasks only reschedule themselves when they finish.
+    """
+    def __init__(self, min_interval_seconds: float, max_interval_seconds: float, target_new_jobs_per_run: float = 1.0,
+                 credit_budget_per_hour: Optional[float] = None):
+        self.min_interval_seconds = min_interval_seconds
+        self.max_interval_seconds = max_interval_seconds
+        self.target_new_jobs_per_run = target_new_jobs_per_run
+        self.credit_budget_per_hour = credit_budget_per_hour
+        # Heap of (next run time, search). A search rescheduled before it runs leaves a stale entry,
+        # which is skipped because it doesn't match next_runs.
+        self._heap: List[Tuple[float, Search]] = []
+        self.next_runs: Dict[Search, float] = {}
+        self.rates: Dict[Search, float] = {}
+        self.costs: Dict[Search, float] = {}
+        self.last_runs: Dict[Search, float] = {}
+
+    def load(self, search: Search, rate: Optional[float], cost: Optional[float], last_run: Optional[float]) -> None:
+        """Restore the stored state of a search, see get_search_rates."""
+        if rate is not None:
+            self.rates[search] = rate
+        if cost is not None:
+            self.costs[search] = cost
+        if last_run is not None:
+            self.last_runs[search] = last_run
+
+    def schedule_at(self, search: Search, next_run: float) -> None:
+        self.next_runs[search] = next_run
+        heapq.heappush(self._heap, (next_run, search))
+
+    def reschedule(self, search: Search) -> float:
+        """Schedule the next run of a search from its current interval. Returns the interval in seconds."""
+        interval = self.interval(search)
+        self.schedule_at(search, time.time() + interval)
+        logger.info(f"Next run of {search[0]} in {search[1]} in {interval / 60:.1f} minutes "
+                    f"(rate {self.rates.get(search, 0):.2f} jobs/hour)")
+        return interval
+
+    def pop_due(self, now: float) -> List[Search]:
+        """Remove and return the searches whose next run time has passed."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            next_run, search = heapq.heappop(self._heap)
+            if self.next_runs.get(search) == next_run:
+                del self.next_runs[search]
+                due.append(search)
+        return due
+
+    def seconds_until_next(self, now: float) -> Optional[float]:
+        if not self._heap:
+            return None
+        return max(self._heap[0][0] - now, 0)
+
+    def _base_interval(self, search: Search) -> float:
+        if search not in self.rates:
+            # Never measured: run often until there is an estimate
+            return self.min_interval_seconds
+        rate = self.rates[search]
+        if rate <= 0:
+            return self.max_interval_seconds
+        return self.target_new_jobs_per_run / rate * 3600
+
+    def _budget_factor(self) -> float:
+        if not self.credit_budget_per_hour:
+            return 1.0
+        planned_credits_per_hour = sum(
+            cost * 3600 / self._clamp(self._base_interval(search)) for search, cost in self.costs.items()
+        )
+        return max(planned_credits_per_hour / self.credit_budget_per_hour, 1.0)
+
+    def _clamp(self, interval: float) -> float:
+        return min(max(interval, self.min_interval_seconds), self.max_interval_seconds)
+
+    def interval(self, search: Search) -> float:
+        return self._clamp(self._base_interval(search) * self._budget_factor())
+
+def estimate_posting_rate(rate: Optional[float], create_dates: List[int], started: float, last_run: Optional[float]) -> float:
+    """
+    Update the posting rate of a search after a run.
+
+    Args:
+        rate (Optional[float]): The current estimate in new jobs per hour, None if the search was never measured.
+        create_dates (List[int]): createDate (milliseconds) of the new jobs found by the run.
+        started (float): Time the run started.
+        last_run (Optional[float]): Time of the previous run, None if there was none.
+
+    Returns:
+        float: The updated posting rate in new jobs per hour.
+    """
+    window_start = last_run if last_run is not None else started - FIRST_RUN_WINDOW_SECONDS
+    # Only jobs created since the previous run count, older ones are reposts or late discoveries
+    new_jobs = sum(1 for create_date in create_dates if create_date / 1000 >= window_start)
+    sample = new_jobs / max(started - window_start, 1) * 3600
+
+    if rate is None:
+        return sample
+    return RATE_SMOOTHING * sample + (1 - RATE_SMOOTHING) * rate
@@ -0,0 +1,63 @@
+import argparse
+import glob
+import os
+import time
+import tracemalloc
+
+from scrapper import extract_mosaic_jobcards, parse_search_page, parse_search_page_regex
+
+# Benchmark of the search page parser over stored Indeed search pages (raw html files).
+# Usage: python benchmark_parser.py --pages-dir sample_pages --repeat 20
+
+def load_sample_pages(pages_dir: str) -> dict:
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+        with open(path, "r", encoding="utf-8") as file:
+            pages[os.path.basename(path)] = file.read()
+    return pages
+
+def measure(parser, html: str, repeat: int) -> tuple:
+    # Time is the mean over all repetitions. Allocations are measured on a separate run because
+    # tracemalloc slows down the parser considerably.
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        parser(html)
+    duration = (time.perf_counter() - start_time) / repeat
+
+    tracemalloc.start()
+    parser(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return duration, peak
+
+def run_benchmark(pages_dir: str, repeat: int):
+    pages = load_sample_pages(pages_dir)
+    if not pages:
+        print(f"No .html pages found in {pages_dir}")
+        return
+
+    parsers = {"fast": parse_search_page, "regex": parse_search_page_regex}
+    totals = {name: [0.0, 0] for name in parsers}
+
+    print(f"{'page':40} {'KB':>8} {'parser':>6} {'ms/page':>10} {'peak KB':>10}")
+    for name, html in pages.items():
+        if extract_mosaic_jobcards(html) is None:
+            print(f"{name:40} fast extractor did not find the data, the fast parser falls back to the regex")
+        for parser_name, parser in parsers.items():
+            duration, peak = measure(parser, html, repeat)
+            totals[parser_name][0] += duration
+            totals[parser_name][1] = max(totals[parser_name][1], peak)
+            print(f"{name:40} {len(html) / 1024:8.1f} {parser_name:>6} {duration * 1000:10.3f} {peak / 1024:10.1f}")
+
+    print()
+    for parser_name, (duration, peak) in totals.items():
+        print(f"{parser_name}: {duration / len(pages) * 1000:.3f} ms/page on average, {peak / 1024:.1f} KB peak allocation")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parse_search_page over stored search pages")
+    parser.add_argument("--pages-dir", default="sample_pages", help="Directory with raw search page .html files")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of times each page is parsed")
+    args = parser.parse_args()
+
+    run_benchmark(args.pages_dir, args.repeat)
@@ -0,0 +1,215 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import tempfile
+import statistics
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from scrapper import ScrappingJobConfig, MOSAIC_JOBCARDS_MARKER, parse_search_page, add_job_keys, check_for_new_jobs, \
+    create_report, write_report
+from redis_utils import async_redis_connection, get_seen_jobs_key, mark_jobs_as_seen, get_searches_to_scrape
+
+# Benchmark of the scrape pipeline at scale on synthetic Indeed search pages. Needs a running Redis,
+# benchmark keys are removed at the end. Usage:
+#   python benchmark_pipeline.py --searches 10 100 1000 --history 10000 1000000 --output bench_results
+#   python benchmark_pipeline.py --compare bench_results/<previous run>.json
+# Every search uses the same query and location, so they all share one seen-jobs index of --history keys.
+
+BENCHMARK_QUERY = "benchmark"
+BENCHMARK_LOCATION = "benchmark"
+HISTORY_BATCH_SIZE = 100_000
+# Size of the html around the job cards script, close to a real search page
+PAGE_PADDING = "<div class=\"css-benchmark\">" + "x" * 300_000 + "</div>"
+
+def make_job_card(job_key: str, rng: random.Random) -> dict:
+    created = int(time.time() * 1000) - rng.randint(0, 30 * 24 * 3600 * 1000)
+    return {
+        "adBlob": "".join(rng.choices("abcdefghijklmnopqrstuvwxyz0123456789+/", k=1500)),
+        "applyCount": rng.randint(0, 500),
+        "company": f"Company {rng.randint(0, 5000)}",
+        "companyBrandingAttributes": {"headerImageUrl": "https://example.com/header.png", "logoUrl": "https://example.com/logo.png"},
+        "companyRating": round(rng.uniform(1, 5), 1),
+        "companyReviewCount": rng.randint(0, 10000),
+        "createDate": created,
+        "displayTitle": f"Software Engineer {rng.randint(0, 100)}",
+        "estimatedSalary": {"formattedRange": "$90K - $120K a year", "max": 120000, "min": 90000, "type": "YEARLY"},
+        "expired": False,
+        "extractedSalary": {"max": 120000, "min": 90000, "type": "yearly"},
+        "formattedLocation": "Tampa, FL",
+        "formattedRelativeTime": "Today",
+        "jobkey": job_key,
+        "link": f"/rc/clk?jk={job_key}",
+        "newJob": True,
+        "organicApplyStartCount": rng.randint(0, 200),
+        "pubDate": created,
+        "remoteWorkModel": {"inlineText": True, "text": "Hybrid work", "type": "HYBRID_WORK"},
+        "snippet": "<ul><li>" + " ".join(rng.choices(["python", "django", "aws", "team", "build", "design", "data"], k=60)) + "</li></ul>",
+        "taxonomyAttributes": [{"attributes": [{"label": "Full-time", "suid": "CF3CP"}], "label": "job-types"}],
+        "title": "Software Engineer",
+        "urgentlyHiring": rng.random() < 0.1,
+    }
+
+def make_synthetic_page(job_keys: list, rng: random.Random) -> str:
+    data = {"metaData": {"mosaicProviderJobCardsModel": {
+        "results": [make_job_card(job_key, rng) for job_key in job_keys],
+        "tierSummaries": [{"jobCount": 1000}],
+    }}}
+    return (f"<html><body>{PAGE_PADDING}<script>{MOSAIC_JOBCARDS_MARKER}{json.dumps(data)};"
+            f"window.mosaic.providerData[\"mosaic-provider-other\"]={{}};</script>{PAGE_PADDING}</body></html>")
+
+def percentiles(latencies: list) -> dict:
+    if len(latencies) < 2:
+        value = latencies[0] if latencies else 0.0
+        return {"p50_ms": value * 1000, "p95_ms": value * 1000, "p99_ms": value * 1000}
+    cuts = statistics.quantiles(latencies, n=100)
+    return {"p50_ms": cuts[49] * 1000, "p95_ms": cuts[94] * 1000, "p99_ms": cuts[98] * 1000}
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is the peak of the whole process so far, in KB on Linux. Each scenario runs in a process
+    # of its own (see measure_scenario), so this is the peak of that scenario alone.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+async def seed_history(history: int) -> None:
+    seen_jobs_key = get_seen_jobs_key(BENCHMARK_QUERY, BENCHMARK_LOCATION)
+    r = await async_redis_connection.get_connection()
+    await r.delete(seen_jobs_key)
+    for batch_start in range(0, history, HISTORY_BATCH_SIZE):
+        batch = [f"history{index:012x}" for index in range(batch_start, min(batch_start + HISTORY_BATCH_SIZE, history))]
+        await mark_jobs_as_seen(seen_jobs_key, batch, max_age_days=1)
+
+async def run_scenario(searches: int, history: int, pages_per_search: int, cards_per_page: int, directory: str) -> dict:
+    rng = random.Random(searches * 31 + history)
+    await seed_history(history)
+    config = ScrappingJobConfig(BENCHMARK_QUERY, BENCHMARK_LOCATION, 25, directory=directory,
+                                fetch_descriptions=False, detect_reposts=False, seen_jobs_max_age_days=1)
+    stage_latencies = {"parse_search_page": [], "add_job_keys": [], "check_for_new_jobs": [], "create_report": [],
+                       "scheduler_tick": []}
+    pages = 0
+    start_time = time.perf_counter()
+
+    for search in range(searches):
+        job_keys = set()
+        results = {}
+        for page in range(pages_per_search):
+            # A third of the cards are already in the history, like a steady-state search
+            page_keys = [
+                f"history{rng.randrange(max(history, 1)):012x}" if history and rng.random() < 0.33
+                else f"s{search:05d}p{page:03d}c{card:03d}"
+                for card in range(cards_per_page)
+            ]
+            html = make_synthetic_page(page_keys, rng)
+
+            step_start = time.perf_counter()
+            parsed_results = parse_search_page(html)
+            stage_latencies["parse_search_page"].append(time.perf_counter() - step_start)
+
+            step_start = time.perf_counter()
+            add_job_keys(parsed_results, job_keys, results)
+            stage_latencies["add_job_keys"].append(time.perf_counter() - step_start)
+            pages += 1
+
+        step_start = time.perf_counter()
+        new_keys = await check_for_new_jobs(job_keys, results, config)
+        stage_latencies["check_for_new_jobs"].append(time.perf_counter() - step_start)
+
+        step_start = time.perf_counter()
+        write_report(await create_report(new_keys, results, config), config)
+        stage_latencies["create_report"].append(time.perf_counter() - step_start)
+
+    # One scheduler tick reads the state of every search at once
+    scheduled_searches = [(f"{BENCHMARK_QUERY}_{search}", BENCHMARK_LOCATION) for search in range(searches)]
+    for _ in range(20):
+        step_start = time.perf_counter()
+        await get_searches_to_scrape(scheduled_searches, 180)
+        stage_latencies["scheduler_tick"].append(time.perf_counter() - step_start)
+
+    duration = time.perf_counter() - start_time
+    return {
+        "searches": searches,
+        "history": history,
+        "pages": pages,
+        "duration_s": duration,
+        "pages_per_s": pages / duration,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": {stage: percentiles(latencies) for stage, latencies in stage_latencies.items()},
+    }
+
+def measure_scenario(searches: int, history: int, pages_per_search: int, cards_per_page: int, directory: str) -> dict:
+    # Entry point of the scenario process
+    async def run():
+        try:
+            return await run_scenario(searches, history, pages_per_search, cards_per_page, directory)
+        finally:
+            await async_redis_connection.close()
+    return asyncio.run(run())
+
+def compare(current: list, baseline_filename: str, threshold: float) -> bool:
+    # Returns True if any p95 latency or the throughput of a matching scenario regressed more than threshold
+    with open(baseline_filename, "r") as file:
+        baseline = {(scenario["searches"], scenario["history"]): scenario for scenario in json.load(file)["scenarios"]}
+
+    regressed = False
+    for scenario in current:
+        previous = baseline.get((scenario["searches"], scenario["history"]))
+        if previous is None:
+            continue
+        changes = {"pages_per_s": previous["pages_per_s"] / scenario["pages_per_s"] - 1}
+        for stage, values in scenario["stages"].items():
+            if stage in previous["stages"] and previous["stages"][stage]["p95_ms"] > 0:
+                changes[f"{stage} p95"] = values["p95_ms"] / previous["stages"][stage]["p95_ms"] - 1
+        for name, change in changes.items():
+            flag = "REGRESSION" if change > threshold else ""
+            regressed = regressed or change > threshold
+            print(f"searches={scenario['searches']:5} history={scenario['history']:9} {name:28} {change * 100:+7.1f}% {flag}")
+    return regressed
+
+async def run_benchmark(args) -> list:
+    scenarios = []
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for history in args.history:
+                for searches in args.searches:
+                    # A fresh process per scenario, so its peak RSS is not inherited from the larger scenarios run before it
+                    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                        scenario = await asyncio.get_running_loop().run_in_executor(
+                            executor, measure_scenario, searches, history, args.pages_per_search, args.cards_per_page, directory
+                        )
+                    scenarios.append(scenario)
+                    print(f"searches={searches:5} history={history:9} {scenario['pages_per_s']:8.1f} pages/s "
+                          f"peak RSS {scenario['peak_rss_mb']:.0f} MB")
+                    for stage, values in scenario["stages"].items():
+                        print(f"    {stage:20} p50 {values['p50_ms']:9.3f} ms  p95 {values['p95_ms']:9.3f} ms  p99 {values['p99_ms']:9.3f} ms")
+    finally:
+        r = await async_redis_connection.get_connection()
+        await r.delete(get_seen_jobs_key(BENCHMARK_QUERY, BENCHMARK_LOCATION))
+        await async_redis_connection.close()
+    return scenarios
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scrape pipeline on synthetic search pages")
+    parser.add_argument("--searches", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--history", type=int, nargs="+", default=[10_000, 100_000], help="Seen job keys in the index")
+    parser.add_argument("--pages-per-search", type=int, default=10)
+    parser.add_argument("--cards-per-page", type=int, default=15)
+    parser.add_argument("--output", default="bench_results", help="Directory where the results are saved as JSON")
+    parser.add_argument("--compare", help="Results file of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    scenarios = asyncio.run(run_benchmark(args))
+
+    os.makedirs(args.output, exist_ok=True)
+    output_filename = os.path.join(args.output, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output_filename, "w") as file:
+        json.dump({"created": datetime.now().isoformat(), "args": vars(args), "scenarios": scenarios}, file, indent=2)
+    print(f"Results saved to {output_filename}")
+
+    if args.compare and compare(scenarios, args.compare, args.threshold):
+        sys.exit(1)
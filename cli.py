@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import argparse
+
+# Command line entry point. Modules with a costly import or setup (the scraper and its Scrapfly client,
+# Redis, tkinter) are only imported by the command that needs them, so short runs from cron or CI start fast.
+# Examples:
+#   python cli.py scrape "software engineer" tampa
+#   python cli.py scrape --config searches.json --incremental
+#   python cli.py scheduler --config searches.json
+#   python cli.py scheduler --config searches.json --role worker
+#   python cli.py report "software engineer" tampa
+#   python cli.py replay "software engineer" tampa --archive-dir scrape_archive/2024-06-01
+
+DEFAULT_CONFIG = "searches.json"
+# Settings a config file can set next to its "searches", with their defaults
+SCHEDULER_SETTINGS = {
+    "run_every_minutes": 3,
+    "staggering_minutes": 5,
+    "max_interval_minutes": 24 * 60,
+    "target_new_jobs_per_run": 1.0,
+    "credit_budget_per_hour": None,
+    "max_concurrent_pages": None,
+    "parse_workers": None,
+    "metrics_port": 9108,
+}
+
+def load_config(filename):
+    # The config file is JSON: {"searches": [{"query": "...", "location": "..."}, ...], "run_every_minutes": 3, ...}
+    with open(filename, "r") as file:
+        config = json.load(file)
+
+    unknown_settings = set(config) - set(SCHEDULER_SETTINGS) - {"searches"}
+    if unknown_settings:
+        raise ValueError(f"Unknown settings in {filename}: {', '.join(sorted(unknown_settings))}")
+    searches = [(search["query"], search["location"]) for search in config.get("searches", [])]
+    settings = {**SCHEDULER_SETTINGS, **{name: value for name, value in config.items() if name != "searches"}}
+    return searches, settings
+
+def get_searches(args):
+    if args.query is not None:
+        if args.location is None:
+            raise ValueError("A location is required with a query")
+        return [(args.query, args.location)]
+    searches, _ = load_config(args.config)
+    return searches
+
+def scrape(args):
+    searches = get_searches(args)
+    if not searches:
+        print("No searches to scrape")
+        return 1
+
+    import asyncio
+    from scrapper import scrape_search, configure_page_concurrency, configure_parse_workers, shutdown_parse_workers
+    from redis_utils import async_redis_connection
+
+    async def run_searches():
+        # The account concurrency is only read from Scrapfly when asked for, it costs a request
+        if args.max_concurrent_pages is not None:
+            await configure_page_concurrency(args.max_concurrent_pages)
+        configure_parse_workers(args.parse_workers)
+        try:
+            return await asyncio.gather(*(
+                scrape_search(query, location, args.radius, incremental=args.incremental) for query, location in searches
+            ))
+        finally:
+            shutdown_parse_workers()
+            await async_redis_connection.close()
+
+    new_job_reports = asyncio.run(run_searches())
+    for (query, location), reports in zip(searches, new_job_reports):
+        print(f"{query} in {location}: " + ("failed" if reports is None else f"{len(reports)} new jobs"))
+    # A failed search fails the command, so cron and CI notice it
+    return 1 if any(reports is None for reports in new_job_reports) else 0
+
+def replay(args):
+    from scrape_archive import scrape_archive, REPLAY_MODE
+    scrape_archive.configure(REPLAY_MODE, args.archive_dir)
+    return scrape(args)
+
+def scheduler(args):
+    if args.role == "worker":
+        # Workers get their searches from the coordinator, the config file only provides their settings
+        settings = load_config(args.config)[1] if os.path.exists(args.config) else SCHEDULER_SETTINGS
+        from work_queue import start_worker
+        start_worker(args.consumer_name, max_concurrent_pages=settings["max_concurrent_pages"],
+                     parse_workers=settings["parse_workers"], metrics_port=settings["metrics_port"])
+        return 0
+
+    searches, settings = load_config(args.config)
+    if not searches:
+        print(f"No searches in {args.config}")
+        return 1
+    if args.role == "coordinator":
+        from work_queue import start_coordinator
+        start_coordinator(searches, settings["run_every_minutes"], settings["staggering_minutes"], settings["metrics_port"],
+                          settings["max_interval_minutes"], settings["target_new_jobs_per_run"], settings["credit_budget_per_hour"])
+    else:
+        from scheduler import start_scheduler
+        start_scheduler(searches, settings["run_every_minutes"], settings["staggering_minutes"], settings["max_concurrent_pages"],
+                        settings["metrics_port"], settings["max_interval_minutes"], settings["target_new_jobs_per_run"],
+                        settings["credit_budget_per_hour"], settings["parse_workers"])
+    return 0
+
+def report(args):
+    # The report of the last run of a search, written by write_report
+    filename = os.path.join(args.directory, f"{args.query}_{args.location}_report.ndjson")
+    if not os.path.exists(filename):
+        print(f"No report for {args.query} in {args.location} in {args.directory}")
+        return 1
+
+    with open(filename, "r") as file:
+        for line in file:
+            if args.json:
+                print(line, end="")
+                continue
+            job = json.loads(line)
+            alerts = f"  [alerts: {', '.join(job['keywordAlerts'])}]" if job.get("keywordAlerts") else ""
+            print(f"{job.get('formattedCreateDate')}  {job.get('displayTitle')} - {job.get('company')} "
+                  f"({job.get('formattedLocation')})  https://www.indeed.com{job.get('link')}{alerts}")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Scrape Indeed searches and report new jobs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_search_arguments(command_parser):
+        command_parser.add_argument("query", nargs="?", help="Search query, every search of --config when omitted")
+        command_parser.add_argument("location", nargs="?")
+        command_parser.add_argument("--config", default=DEFAULT_CONFIG, help="JSON file with the searches")
+        command_parser.add_argument("--radius", type=int, default=25)
+        command_parser.add_argument("--incremental", action="store_true", help="Stop at the first already known pages")
+        command_parser.add_argument("--max-concurrent-pages", type=int, help="Pages in flight, 5 when omitted")
+        # Starting worker processes costs more than parsing the few pages of a short run
+        command_parser.add_argument("--parse-workers", type=int, default=0, help="Parse processes, 0 parses in the main process")
+
+    scrape_parser = subparsers.add_parser("scrape", help="Scrape searches once")
+    add_search_arguments(scrape_parser)
+    scrape_parser.set_defaults(handler=scrape)
+
+    replay_parser = subparsers.add_parser("replay", help="Scrape searches once from a recorded archive, offline")
+    add_search_arguments(replay_parser)
+    replay_parser.add_argument("--archive-dir", default="scrape_archive")
+    replay_parser.set_defaults(handler=replay)
+
+    scheduler_parser = subparsers.add_parser("scheduler", help="Scrape the searches of --config on a schedule")
+    scheduler_parser.add_argument("--config", default=DEFAULT_CONFIG, help="JSON file with the searches and settings")
+    scheduler_parser.add_argument("--role", choices=("local", "coordinator", "worker"), default="local",
+                                  help="local scrapes in this process, coordinator publishes to workers")
+    scheduler_parser.add_argument("--consumer-name", help="Name of a worker, host and process id when omitted")
+    scheduler_parser.set_defaults(handler=scheduler)
+
+    report_parser = subparsers.add_parser("report", help="Print the new jobs of the last run of a search")
+    report_parser.add_argument("query")
+    report_parser.add_argument("location")
+    report_parser.add_argument("--directory", default="scrapped_data")
+    report_parser.add_argument("--json", action="store_true", help="Print the full report of each job as JSON")
+    report_parser.set_defaults(handler=report)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
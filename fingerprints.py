@@ -0,0 +1,116 @@
+import re
+import json
+import hashlib
+
+from typing import Dict, List, Set
+from logging_config import app_logger
+from redis_utils import find_seen_job_keys, mark_jobs_as_seen, get_simhash_candidates, add_simhashes
+
+logger = app_logger.getChild('fingerprints')
+
+# Sorted set with the exact fingerprints of every reported job, shared by all searches
+FINGERPRINTS_KEY = "job_fingerprints"
+SIMHASH_BITS = 64
+# The simhash is split into bands, a near duplicate within SIMHASH_BANDS - 1 differing bits is
+# guaranteed to match at least one band exactly, so only jobs sharing a band are compared
+SIMHASH_BANDS = 4
+SIMHASH_BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+
+def normalize(text: str) -> str:
+    text = re.sub(r"<[^>]+>", " ", text or "")
+    text = re.sub(r"[^a-z0-9]+", " ", text.lower())
+    return text.strip()
+
+def exact_fingerprint(job: Dict) -> str:
+    # A reposted job usually gets a new job key but keeps the company, title, location and salary
+    salary = json.dumps(job.get("extractedSalary") or job.get("salarySnippet"), sort_keys=True)
+    parts = [normalize(job.get("company")), normalize(job.get("title")), normalize(job.get("formattedLocation")), salary]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+def posting_fingerprint(job: Dict) -> str:
+    # Snippets of one company are often templated, so only jobs with the same company, title and location
+    # are compared by snippet. Otherwise different roles or cities of an employer would look like reposts.
+    parts = [normalize(job.get("company")), normalize(job.get("title")), normalize(job.get("formattedLocation"))]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+def simhash(text: str) -> int:
+    # Each word votes on every bit of the hash with the bits of its own 64 bit hash. Similar texts share
+    # most of their words, so their simhashes differ in only a few bits.
+    weights = [0] * SIMHASH_BITS
+    for word in normalize(text).split():
+        word_hash = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if word_hash >> bit & 1 else -1
+
+    value = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            value |= 1 << bit
+    return value
+
+def hamming_distance(first: int, second: int) -> int:
+    return bin(first ^ second).count("1")
+
+def simhash_band_keys(posting: str, value: int) -> List[str]:
+    mask = (1 << SIMHASH_BAND_BITS) - 1
+    return [
+        f"job_simhash_{posting}_{band}_{value >> (band * SIMHASH_BAND_BITS) & mask}"
+        for band in range(SIMHASH_BANDS)
+    ]
+
+async def find_reposts(jobs: Dict[str, Dict], max_distance: int, max_age_days: int) -> Set[str]:
+    """
+    Find the jobs that are reposts or near duplicates of jobs reported before, by any search.
+
+    Args:
+        jobs (Dict[str, Dict]): The new job cards keyed by job key.
+        max_distance (int): Maximum number of differing simhash bits for two snippets with the same
+            company, title and location to be considered the same job. Must be lower than SIMHASH_BANDS.
+        max_age_days (int): Number of days a fingerprint is remembered after it was last seen.
+
+    Returns:
+        Set[str]: The job keys of the duplicates.
+
+    Note:
+        A job is a duplicate if its normalized company, title, location and salary match a known job,
+        or if its snippet simhash is within max_distance bits of a known job with the same company,
+        title and location (the salary may differ).
+        The cost per job is a fixed number of Redis lookups, whatever the size of the history.
+        The fingerprints of all the given jobs are added to the index.
+    """
+    if not jobs:
+        return set()
+
+    exact = {job_key: exact_fingerprint(job) for job_key, job in jobs.items()}
+    # Jobs without a snippet are only compared by their exact fingerprint
+    hashes = {job_key: simhash(job["snippet"]) for job_key, job in jobs.items() if normalize(job.get("snippet"))}
+    band_keys = {
+        job_key: simhash_band_keys(posting_fingerprint(jobs[job_key]), value)
+        for job_key, value in hashes.items()
+    }
+
+    known_fingerprints = await find_seen_job_keys(FINGERPRINTS_KEY, list(set(exact.values())))
+    candidates = await get_simhash_candidates([key for keys in band_keys.values() for key in keys])
+
+    duplicates = set()
+    for job_key in jobs:
+        near_duplicate = any(
+            hamming_distance(hashes[job_key], candidate) <= max_distance
+            for key in band_keys.get(job_key, ()) for candidate in candidates.get(key, ())
+        )
+        if exact[job_key] in known_fingerprints or near_duplicate:
+            duplicates.add(job_key)
+        # Later jobs of the same run are compared against this one as well
+        known_fingerprints.add(exact[job_key])
+        for key in band_keys.get(job_key, ()):
+            candidates.setdefault(key, set()).add(hashes[job_key])
+
+    await mark_jobs_as_seen(FINGERPRINTS_KEY, list(set(exact.values())), max_age_days)
+    band_entries = {}
+    for job_key, keys in band_keys.items():
+        for key in keys:
+            band_entries.setdefault(key, []).append(hashes[job_key])
+    await add_simhashes(band_entries, max_age_days * 24 * 60 * 60)
+
+    logger.info(f"Found {len(duplicates)} reposted or duplicate jobs out of {len(jobs)}")
+    return duplicates
@@ -1,39 +1,113 @@
 import tkinter as tk
 
-from queue import Queue
+from queue import Queue, Empty
 from threading import Thread
-from concurrent.futures import ThreadPoolExecutor
 from colorama import Fore
 from logging_config import app_logger
 from redis_utils import set_jobs_as_viewed, should_scrape_by_time
 
 logger = app_logger.getChild('gui')
 
-# Create a thread pool for processing GUI updates
-# alert_executor = ThreadPoolExecutor(max_workers=13)
-alert_executor = None
+# How often the GUI thread drains gui_queue
+GUI_POLL_MILLISECONDS = 200
+
 gui_queue = Queue()
 gui_thread_instance = None
+# Alert window of each (query, location) with new jobs that were not viewed yet
 open_alerts = {}
 
-def initialize_alert_executor(max_workers):
-    print(f"Max Workers will be {max_workers}")
-    global alert_executor
-    alert_executor = ThreadPoolExecutor(max_workers=max_workers)
+class NewJobsAlert:
+    """
+    The alert window of one search. Later alerts of the same search update it instead of opening another window.
+    """
+    def __init__(self, root, title, message, job_type, location, scraps_staggering_minutes):
+        self.job_type = job_type
+        self.location = location
+        self.scraps_staggering_minutes = scraps_staggering_minutes
+        self.message = message
+        self.count = 1
 
-def gui_thread(queue):
+        self.window = tk.Toplevel(root)
+        self.window.title(title)
+        self.window.geometry("300x150")
+        self.window.protocol("WM_DELETE_WINDOW", self.on_ok)
+
+        self.message_label = tk.Label(self.window, text=message, wraplength=280)
+        self.message_label.pack()
+
+        ok_button = tk.Button(self.window, text="OK", command=self.on_ok)
+        ok_button.pack(pady=10)
+
+    def add(self, message):
+        self.count += 1
+        self.message = message
+        self.message_label.config(text=f"{message}\n({self.count} scrapes with new jobs)")
+        self.window.lift()
+
+    def on_ok(self):
+        try:
+            set_jobs_as_viewed(self.job_type, self.location)
+            logger.info(Fore.YELLOW + f"Jobs set as viewed for {self.location}, {self.job_type}")
+            should_scrape_time = should_scrape_by_time(self.job_type, self.location, self.scraps_staggering_minutes * 60)
+            logger.info(Fore.YELLOW + f"Should scrape time after clicking ok: {should_scrape_time}")
+        except Exception as e:
+            logger.error(Fore.RED + f"Failed to set jobs as viewed: {e}")
+        finally:
+            self.window.destroy()
+            open_alerts.pop((self.job_type, self.location), None)
+
+def show_new_jobs_alert(root, title, message, job_type, location, scraps_staggering_minutes):
+    # Alerts are coalesced per search: one window per (query, location) whatever the number of scrapes
+    alert = open_alerts.get((job_type, location))
+    if alert is not None:
+        alert.add(message)
+        return
+    open_alerts[(job_type, location)] = NewJobsAlert(root, title, message, job_type, location, scraps_staggering_minutes)
+    logger.info(Fore.BLUE + f"Alert displayed: {title} - {message}")
+
+def poll_queue(root, queue):
+    # Runs on the GUI thread through after(), so every window is only touched by the thread owning the Tk root
     while True:
-        message = queue.get()
-        if message is None:
+        try:
+            message = queue.get_nowait()
+        except Empty:
             break
+        if message is None:
+            root.quit()
+            return
         title, body, query, location, scraps_staggering_minutes = message
-        if (query, location) not in open_alerts:
-            open_alerts[(query, location)] = True
-            alert_executor.submit(show_new_jobs_alert, title, body, query, location, scraps_staggering_minutes)
+        try:
+            show_new_jobs_alert(root, title, body, query, location, scraps_staggering_minutes)
+        except Exception as e:
+            logger.error(Fore.RED + f"Failed to display alert: {e}")
+            print(Fore.RED + f"Alert (console fallback): {title} - {body}")
+    root.after(GUI_POLL_MILLISECONDS, poll_queue, root, queue)
 
-def start_gui_thread(max_workers):
+def console_alerts(queue):
+    # Used when Tk cannot start, e.g. without a display
+    while (message := queue.get()) is not None:
+        title, body = message[:2]
+        print(Fore.RED + f"Alert (console fallback): {title} - {body}")
+
+def gui_thread(queue):
+    # A single Tk root owned by this thread shows the alerts of every search as Toplevel windows
+    try:
+        root = tk.Tk()
+    except Exception as e:
+        logger.error(Fore.RED + f"Failed to start the GUI, alerts are printed to the console: {e}")
+        console_alerts(queue)
+        return
+
+    root.withdraw()  # Hide the root window
+    root.after(GUI_POLL_MILLISECONDS, poll_queue, root, queue)
+    try:
+        root.mainloop()
+    finally:
+        open_alerts.clear()
+        root.destroy()
+
+def start_gui_thread():
     global gui_thread_instance
-    initialize_alert_executor(max_workers)
     gui_thread_instance = Thread(target=gui_thread, args=(gui_queue,))
     gui_thread_instance.start()
 
@@ -42,38 +116,4 @@ def stop_gui_thread():
     if gui_thread_instance:
         gui_queue.put(None)  # Signal the GUI thread to exit
         gui_thread_instance.join()
-        alert_executor.shutdown(wait=True)
         gui_thread_instance = None
-
-def show_new_jobs_alert(title, message, job_type, location, scraps_staggering_minutes):
-    root = tk.Tk()
-    root.withdraw()  # Hide the root window
-    
-    try:
-        alert_window = tk.Toplevel()
-        alert_window.title(title)
-        alert_window.geometry("300x150")
-
-        # Add message to the window
-        message_label = tk.Label(alert_window, text=message)
-        message_label.pack()
-
-        # Function to handle OK button click
-        def on_ok():
-            set_jobs_as_viewed(job_type, location)
-            logger.info(Fore.YELLOW + f"Jobs set as viewed for {location}, {job_type}")
-            alert_window.destroy()
-            del open_alerts[(job_type, location)]  # Remove from open alerts
-            should_scrape_time = should_scrape_by_time(job_type, location, scraps_staggering_minutes * 60)
-            logger.info(Fore.YELLOW + f"Should scrape time after clicking ok: {should_scrape_time}")
-            # asyncio.create_task(perform_scheduled_scrape(job_type, location, gui_queue, scraps_staggering_minutes))
-
-        ok_button = tk.Button(alert_window, text="OK", command=on_ok)
-        ok_button.pack(pady=10)
-
-        logger.info(Fore.BLUE + f"Alert displayed: {title} - {message}")
-        root.mainloop()
-
-    except Exception as e:
-        logger.error(Fore.RED + f"Failed to display alert or set jobs as viewed: {e}")
-        print(Fore.RED + f"Alert (console fallback): {title} - {message}")
\ No newline at end of file
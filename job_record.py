@@ -0,0 +1,91 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+# Keys of a job card included in the report, in report order. Timestamps also get a human readable
+# version under the second name, right after the original key.
+REPORT_PROJECTION = (
+    ("applyCount", None),
+    ("company", None),
+    ("companyRating", None),
+    ("companyReviewCount", None),
+    ("createDate", "formattedCreateDate"),
+    ("displayTitle", None),
+    ("estimatedSalary", None),
+    ("extractedSalary", None),
+    ("expired", None),
+    ("employerResponsive", None),
+    ("formattedLocation", None),
+    ("formattedRelativeTime", None),
+    ("hiringMultipleCandidatesModel", None),
+    ("jobCardRequirementsModel", None),
+    ("jobkey", None),
+    ("link", None),
+    ("newJob", None),
+    ("organicApplyStartCount", None),
+    ("pubDate", "formattedPubDate"),
+    ("remoteLocation", None),
+    ("remoteWorkModel", None),
+    ("taxonomyAttributes", None),
+    ("title", None),
+    ("salarySnippet", None),
+    ("urgentlyHiring", None),
+)
+# Keys of a job card kept for the job store and repost detection but left out of the report
+STORE_ONLY_FIELDS = ("snippet",)
+JOB_FIELDS = tuple(key for key, _ in REPORT_PROJECTION) + STORE_ONLY_FIELDS
+
+# Value of a field missing from the card, so a card holding null is told apart from one without the key
+MISSING = object()
+
+def compact_card(card: Dict) -> Dict:
+    # The JOB_FIELDS of a card, e.g. to send parsed cards back from a parse worker process
+    return {key: card[key] for key in JOB_FIELDS if key in card}
+
+def formatCreateDate(create_date: str) -> str:
+    formatted_date = int(create_date) / 1000
+    date = datetime.fromtimestamp(formatted_date)
+    formatted_date = date.strftime('%Y-%m-%d %H:%M:%S %Z')
+
+    return formatted_date
+
+class JobRecord:
+    """
+    The fields of a job card that are actually used, without the rest of Indeed's payload.
+
+    A card from the search page holds ad blobs, branding attributes and HTML that are never read,
+    so only JOB_FIELDS are kept, in slots rather than a dict. The raw card is only kept when it is
+    dumped as is (save_raw_results), so a run's memory grows with the fields used, not the payload size.
+    """
+    __slots__ = JOB_FIELDS + ("raw",)
+
+    def __init__(self, fields: Dict, raw: Optional[Dict] = None):
+        for key in JOB_FIELDS:
+            setattr(self, key, fields.get(key, MISSING))
+        self.raw = raw
+
+    @classmethod
+    def from_card(cls, card: Dict, keep_raw: bool = False) -> "JobRecord":
+        return cls(card, card if keep_raw else None)
+
+    def get(self, key: str, default=None):
+        value = getattr(self, key, MISSING)
+        return default if value is MISSING else value
+
+    def to_report(self) -> Dict:
+        # The projection written to the report, with "Not provided" for missing keys
+        job_report = {}
+        for key, formatted_key in REPORT_PROJECTION:
+            value = getattr(self, key)
+            if value is MISSING:
+                job_report[key] = "Not provided"
+                continue
+            job_report[key] = value
+            if formatted_key is not None:
+                job_report[formatted_key] = formatCreateDate(value)
+        return job_report
+
+    def to_store(self) -> Dict:
+        # The card saved to the job store, the checkpoint and the raw results. from_card reads it back.
+        if self.raw is not None:
+            return self.raw
+        return {key: value for key in JOB_FIELDS if (value := getattr(self, key)) is not MISSING}
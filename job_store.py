@@ -0,0 +1,485 @@
+import sys
+import json
+import time
+import sqlite3
+import argparse
+
+from typing import Dict, Iterable, List, Optional, Tuple
+from logging_config import app_logger
+
+logger = app_logger.getChild('job_store')
+
+DEFAULT_DATABASE = "scrapped_data/jobs.sqlite3"
+# Number of rows written per executemany call
+UPSERT_BATCH_SIZE = 500
+# Used to compare salaries of different periods, see yearly_salary
+YEARLY_MULTIPLIERS = {"yearly": 1, "monthly": 12, "weekly": 52, "daily": 260, "hourly": 2080}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    jobkey TEXT PRIMARY KEY,
+    query TEXT,
+    location TEXT,
+    company TEXT,
+    title TEXT,
+    formatted_location TEXT,
+    create_date INTEGER,
+    salary_min REAL,
+    salary_max REAL,
+    salary_type TEXT,
+    yearly_salary_max REAL,
+    company_rating REAL,
+    description TEXT,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_company ON jobs (company);
+CREATE INDEX IF NOT EXISTS jobs_create_date ON jobs (create_date);
+CREATE INDEX IF NOT EXISTS jobs_yearly_salary_max ON jobs (yearly_salary_max);
+CREATE INDEX IF NOT EXISTS jobs_last_seen ON jobs (last_seen);
+"""
+
+# Full-text index over the text fields of the jobs, kept up to date by triggers on the jobs table.
+# FTS5 keeps a postings list per token and ranks matches with BM25, so a search only reads the
+# postings of its terms. Rows are only re-indexed when their card or description actually changes,
+# not every time a job is seen again.
+FULL_TEXT_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+    title, company, snippet, taxonomy, description, tokenize = 'porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS jobs_fts_insert AFTER INSERT ON jobs BEGIN
+    INSERT INTO jobs_fts (rowid, title, company, snippet, taxonomy, description)
+    VALUES (new.rowid, new.title, new.company, json_extract(new.data, '$.snippet'),
+            json_extract(new.data, '$.taxonomyAttributes'), new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_fts_update AFTER UPDATE ON jobs
+WHEN old.data IS NOT new.data OR old.description IS NOT new.description BEGIN
+    DELETE FROM jobs_fts WHERE rowid = old.rowid;
+    INSERT INTO jobs_fts (rowid, title, company, snippet, taxonomy, description)
+    VALUES (new.rowid, new.title, new.company, json_extract(new.data, '$.snippet'),
+            json_extract(new.data, '$.taxonomyAttributes'), new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_fts_delete AFTER DELETE ON jobs BEGIN
+    DELETE FROM jobs_fts WHERE rowid = old.rowid;
+END;
+CREATE INDEX IF NOT EXISTS jobs_company_rating ON jobs (company_rating);
+CREATE TABLE IF NOT EXISTS keyword_alerts (
+    id INTEGER PRIMARY KEY,
+    query TEXT NOT NULL,
+    min_yearly_salary REAL,
+    min_company_rating REAL
+);
+"""
+# Indexes the jobs of a database created before the full-text index, see __init__
+BACKFILL_FULL_TEXT_INDEX = """
+INSERT INTO jobs_fts (rowid, title, company, snippet, taxonomy, description)
+SELECT rowid, title, company, json_extract(data, '$.snippet'), json_extract(data, '$.taxonomyAttributes'), description
+FROM jobs
+"""
+# Append-only log of the fields of a job that change over its life, one row per changed field. Only the
+# changes are written, so the history of a job costs a few rows instead of a snapshot per run.
+CHANGES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_changes (
+    jobkey TEXT NOT NULL,
+    changed_at INTEGER NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS job_changes_jobkey ON job_changes (jobkey, changed_at);
+"""
+# Fields of a card tracked in job_changes
+TRACKED_FIELDS = ("applyCount", "organicApplyStartCount", "urgentlyHiring", "expired")
+# Columns added after the first version of the store, added to existing databases on open
+ADDED_COLUMNS = {"company_rating": "REAL", "description": "TEXT"}
+
+UPSERT = """
+INSERT INTO jobs (jobkey, query, location, company, title, formatted_location, create_date,
+                  salary_min, salary_max, salary_type, yearly_salary_max, company_rating, first_seen, last_seen, data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (jobkey) DO UPDATE SET
+    company = excluded.company,
+    title = excluded.title,
+    formatted_location = excluded.formatted_location,
+    salary_min = excluded.salary_min,
+    salary_max = excluded.salary_max,
+    salary_type = excluded.salary_type,
+    yearly_salary_max = excluded.yearly_salary_max,
+    company_rating = excluded.company_rating,
+    last_seen = excluded.last_seen,
+    data = excluded.data
+"""
+
+def find_changes(job: Dict, stored_job: Optional[Dict]) -> List[Tuple[str, str]]:
+    # (field, JSON value) of the tracked fields that differ from the stored card. A new job records the
+    # fields it has, so its history starts with their first values.
+    stored_job = stored_job or {}
+    return [(field, json.dumps(job.get(field))) for field in TRACKED_FIELDS if job.get(field) != stored_job.get(field)]
+
+def yearly_salary(value: Optional[float], salary_type: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    return value * YEARLY_MULTIPLIERS.get((salary_type or "yearly").lower(), 1)
+
+class JobStore:
+    """
+    An embedded SQLite store of every job card scraped, with first and last seen timestamps.
+
+    Cards are upserted in batched transactions, so history accumulates cheaply, and the columns
+    used to filter (job key, company, create date, salary) are indexed so queries stay fast as
+    the table grows. A connection is opened per operation, which lets the store be used from
+    worker threads (asyncio.to_thread) without sharing connections between threads.
+    """
+    def __init__(self, path: str = DEFAULT_DATABASE):
+        """
+        Initialize the store and create the schema if needed.
+
+        Args:
+            path (str): Path of the SQLite database file.
+        """
+        self.path = path
+        connection = self._connect()
+        try:
+            connection.executescript(SCHEMA)
+            existing_columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in ADDED_COLUMNS.items():
+                if column not in existing_columns:
+                    connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            has_full_text_index = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'jobs_fts'").fetchone() is not None
+            connection.executescript(FULL_TEXT_SCHEMA)
+            if not has_full_text_index:
+                # Jobs stored before the index existed are only indexed by the triggers when they change
+                with connection:
+                    connection.execute(BACKFILL_FULL_TEXT_INDEX)
+            connection.executescript(CHANGES_SCHEMA)
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path)
+        # WAL lets queries run while a scrape is writing
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def save_jobs(self, query: str, location: str, jobs: Iterable[Dict], seen_job_keys: Iterable[str] = ()) -> None:
+        """
+        Upsert job cards and update the last seen time of jobs that were seen without their card.
+
+        The tracked fields of each card are compared with the stored card of the same job, and the
+        ones that changed are appended to job_changes in the same transaction, see job_history.
+
+        Args:
+            query (str): The search query the jobs were found with.
+            location (str): The search location the jobs were found with.
+            jobs (Iterable[Dict]): The job cards as found in the search page.
+            seen_job_keys (Iterable[str]): Job keys seen in this run, e.g. from unchanged cached pages.
+        """
+        now = int(time.time())
+        # Read twice, once for the rows and once for the changes
+        jobs = list(jobs)
+        rows = []
+        for job in jobs:
+            # The salary from the posting when there is one, Indeed's estimate otherwise
+            salary = job.get("extractedSalary") or job.get("estimatedSalary") or {}
+            rows.append((
+                job["jobkey"], query, location, job.get("company"), job.get("title"), job.get("formattedLocation"),
+                job.get("createDate"), salary.get("min"), salary.get("max"), salary.get("type"),
+                yearly_salary(salary.get("max"), salary.get("type")), job.get("companyRating"), now, now, json.dumps(job),
+            ))
+        seen_job_keys = [(now, job_key) for job_key in seen_job_keys]
+
+        connection = self._connect()
+        try:
+            # One transaction for the whole run
+            with connection:
+                # The stored cards are read before the upsert replaces them
+                stored_jobs = {}
+                for batch_start in range(0, len(rows), UPSERT_BATCH_SIZE):
+                    batch = [row[0] for row in rows[batch_start:batch_start + UPSERT_BATCH_SIZE]]
+                    stored_jobs.update(connection.execute(
+                        f"SELECT jobkey, data FROM jobs WHERE jobkey IN ({','.join('?' * len(batch))})", batch,
+                    ).fetchall())
+                changes = []
+                for job in jobs:
+                    stored_job = stored_jobs.get(job["jobkey"])
+                    for field, value in find_changes(job, json.loads(stored_job) if stored_job is not None else None):
+                        changes.append((job["jobkey"], now, field, value))
+                connection.executemany("INSERT INTO job_changes (jobkey, changed_at, field, value) VALUES (?, ?, ?, ?)", changes)
+
+                for batch_start in range(0, len(rows), UPSERT_BATCH_SIZE):
+                    connection.executemany(UPSERT, rows[batch_start:batch_start + UPSERT_BATCH_SIZE])
+                for batch_start in range(0, len(seen_job_keys), UPSERT_BATCH_SIZE):
+                    connection.executemany("UPDATE jobs SET last_seen = ? WHERE jobkey = ?",
+                                           seen_job_keys[batch_start:batch_start + UPSERT_BATCH_SIZE])
+            logger.info(f"Saved {len(rows)} jobs and {len(changes)} field changes for {query} in {location} to {self.path}")
+        finally:
+            connection.close()
+
+    def find_jobs(self, company: Optional[str] = None, title: Optional[str] = None, min_yearly_salary: Optional[float] = None,
+                  created_since: Optional[int] = None, seen_since: Optional[int] = None, limit: int = 100) -> List[Dict]:
+        """
+        Find jobs matching all the given filters, newest first.
+
+        Args:
+            company (str, optional): Exact company name.
+            title (str, optional): Text contained in the title (case insensitive).
+            min_yearly_salary (float, optional): Minimum of the maximum salary, converted to a yearly amount.
+            created_since (int, optional): Only jobs created after this Unix timestamp in seconds.
+            seen_since (int, optional): Only jobs seen after this Unix timestamp in seconds.
+            limit (int): Maximum number of jobs returned.
+
+        Returns:
+            List[Dict]: The job cards, with first_seen and last_seen added.
+        """
+        conditions, parameters = [], []
+        if company is not None:
+            conditions.append("company = ?")
+            parameters.append(company)
+        if title is not None:
+            conditions.append("title LIKE ?")
+            parameters.append(f"%{title}%")
+        if min_yearly_salary is not None:
+            conditions.append("yearly_salary_max >= ?")
+            parameters.append(min_yearly_salary)
+        if created_since is not None:
+            # createDate is in milliseconds
+            conditions.append("create_date >= ?")
+            parameters.append(created_since * 1000)
+        if seen_since is not None:
+            conditions.append("last_seen >= ?")
+            parameters.append(seen_since)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                f"SELECT data, first_seen, last_seen FROM jobs {where} ORDER BY create_date DESC LIMIT ?",
+                (*parameters, limit),
+            ).fetchall()
+        finally:
+            connection.close()
+
+        return [{**json.loads(row["data"]), "first_seen": row["first_seen"], "last_seen": row["last_seen"]} for row in rows]
+
+    def job_history(self, job_key: str) -> List[Dict]:
+        """
+        Reconstruct the history of the tracked fields of a job from its changes.
+
+        Args:
+            job_key (str): The job key.
+
+        Returns:
+            List[Dict]: The state of the tracked fields after each change, oldest first, with the
+            Unix timestamp of the change under "time". Empty if the job has no recorded changes.
+        """
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT changed_at, field, value FROM job_changes WHERE jobkey = ? ORDER BY changed_at, rowid", (job_key,),
+            ).fetchall()
+        finally:
+            connection.close()
+
+        history, state = [], {}
+        for row in rows:
+            state[row["field"]] = json.loads(row["value"])
+            # Fields changed in the same run are one step of the history
+            if history and history[-1]["time"] == row["changed_at"]:
+                history[-1] = {"time": row["changed_at"], **state}
+            else:
+                history.append({"time": row["changed_at"], **state})
+        return history
+
+    def save_descriptions(self, descriptions: Dict[str, str]) -> None:
+        """
+        Add job descriptions to stored jobs, which also adds them to the full-text index.
+
+        Args:
+            descriptions (Dict[str, str]): The description of each job key.
+        """
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany("UPDATE jobs SET description = ? WHERE jobkey = ?",
+                                       [(description, job_key) for job_key, description in descriptions.items()])
+        finally:
+            connection.close()
+
+    def search(self, text: str, min_yearly_salary: Optional[float] = None, min_company_rating: Optional[float] = None,
+               job_keys: Optional[List[str]] = None, limit: int = 20) -> List[Dict]:
+        """
+        Full-text search over title, company, snippet, taxonomy attributes and description, best matches first.
+
+        Args:
+            text (str): An FTS5 query, e.g. "python django", "remote NOT senior" or "title:rust". Terms with
+                punctuation must be quoted, e.g. '"node.js"' or '"full-time"'.
+            min_yearly_salary (float, optional): Minimum of the maximum salary, converted to a yearly amount.
+            min_company_rating (float, optional): Minimum company rating.
+            job_keys (List[str], optional): Only search among these jobs.
+            limit (int): Maximum number of jobs returned.
+
+        Returns:
+            List[Dict]: The job cards, with first_seen, last_seen and the BM25 score added
+            (lower is better, as returned by SQLite).
+
+        Raises:
+            ValueError: If text is not a valid FTS5 query.
+        """
+        conditions, parameters = ["jobs_fts MATCH ?"], [text]
+        if min_yearly_salary is not None:
+            conditions.append("jobs.yearly_salary_max >= ?")
+            parameters.append(min_yearly_salary)
+        if min_company_rating is not None:
+            conditions.append("jobs.company_rating >= ?")
+            parameters.append(min_company_rating)
+        if job_keys is not None:
+            conditions.append(f"jobs.jobkey IN ({','.join('?' * len(job_keys))})")
+            parameters.extend(job_keys)
+
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                f"""SELECT jobs.data, jobs.first_seen, jobs.last_seen, bm25(jobs_fts) AS score
+                    FROM jobs_fts JOIN jobs ON jobs.rowid = jobs_fts.rowid
+                    WHERE {' AND '.join(conditions)} ORDER BY score LIMIT ?""",
+                (*parameters, limit),
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            # FTS5 reads punctuation as query syntax, e.g. "node.js" or "full-time" unquoted
+            raise ValueError(f"Invalid full-text query {text!r}, quote terms with punctuation: {e}") from e
+        finally:
+            connection.close()
+
+        return [
+            {**json.loads(row["data"]), "first_seen": row["first_seen"], "last_seen": row["last_seen"], "score": row["score"]}
+            for row in rows
+        ]
+
+    def add_alert(self, text: str, min_yearly_salary: Optional[float] = None, min_company_rating: Optional[float] = None) -> int:
+        """
+        Save a keyword alert, checked against new jobs by match_alerts.
+
+        Args:
+            text (str): An FTS5 query, see search.
+            min_yearly_salary (float, optional): Minimum yearly salary of matching jobs.
+            min_company_rating (float, optional): Minimum company rating of matching jobs.
+
+        Returns:
+            int: The id of the alert.
+
+        Raises:
+            ValueError: If text is not a valid FTS5 query.
+        """
+        # An invalid query is rejected now rather than failing every later run
+        self.search(text, limit=1)
+        connection = self._connect()
+        try:
+            with connection:
+                cursor = connection.execute(
+                    "INSERT INTO keyword_alerts (query, min_yearly_salary, min_company_rating) VALUES (?, ?, ?)",
+                    (text, min_yearly_salary, min_company_rating),
+                )
+            return cursor.lastrowid
+        finally:
+            connection.close()
+
+    def match_alerts(self, job_keys: List[str]) -> Dict[str, List[str]]:
+        """
+        Check the keyword alerts against the given jobs only, without scanning the rest of the history.
+
+        Args:
+            job_keys (List[str]): The jobs to check, usually the new jobs of a run.
+
+        Returns:
+            Dict[str, List[str]]: The job keys matching each alert query.
+        """
+        if not job_keys:
+            return {}
+
+        connection = self._connect()
+        try:
+            alerts = connection.execute("SELECT query, min_yearly_salary, min_company_rating FROM keyword_alerts").fetchall()
+        finally:
+            connection.close()
+
+        matches = {}
+        for alert in alerts:
+            try:
+                jobs = self.search(alert["query"], alert["min_yearly_salary"], alert["min_company_rating"], job_keys, len(job_keys))
+            except ValueError as e:
+                # Alerts saved before queries were checked, one bad alert must not fail the search
+                logger.error(f"Skipping keyword alert: {e}")
+                continue
+            if jobs:
+                matches[alert["query"]] = [job["jobkey"] for job in jobs]
+        return matches
+
+job_stores = {}
+
+def get_job_store(path: str = DEFAULT_DATABASE) -> JobStore:
+    """Return the store of a database file, creating it on first use."""
+    if path not in job_stores:
+        job_stores[path] = JobStore(path)
+    return job_stores[path]
+
+if __name__ == "__main__":
+    # Examples:
+    #   python job_store.py find --title python --min-salary 120000 --seen-days 7
+    #   python job_store.py search "python AND (django OR flask)" --min-rating 3.5
+    #   python job_store.py add-alert "rust" --min-salary 150000
+    #   python job_store.py history 3f2a1b4c5d6e7f80
+    parser = argparse.ArgumentParser(description="Query the local job store")
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    find_parser = subparsers.add_parser("find", help="Filter jobs by company, title, salary and dates")
+    find_parser.add_argument("--company")
+    find_parser.add_argument("--title", help="Text contained in the title")
+    find_parser.add_argument("--min-salary", type=float, help="Minimum yearly salary")
+    find_parser.add_argument("--created-days", type=int, help="Only jobs created in the last N days")
+    find_parser.add_argument("--seen-days", type=int, help="Only jobs seen in the last N days")
+    find_parser.add_argument("--limit", type=int, default=100)
+
+    search_parser = subparsers.add_parser("search", help="Full-text search ranked with BM25")
+    search_parser.add_argument("text", help="FTS5 query")
+    search_parser.add_argument("--min-salary", type=float, help="Minimum yearly salary")
+    search_parser.add_argument("--min-rating", type=float, help="Minimum company rating")
+    search_parser.add_argument("--limit", type=int, default=20)
+
+    alert_parser = subparsers.add_parser("add-alert", help="Save a keyword alert checked against new jobs")
+    alert_parser.add_argument("text", help="FTS5 query")
+    alert_parser.add_argument("--min-salary", type=float, help="Minimum yearly salary")
+    alert_parser.add_argument("--min-rating", type=float, help="Minimum company rating")
+
+    history_parser = subparsers.add_parser("history", help="Show how the applicant counts and flags of a job changed")
+    history_parser.add_argument("job_key")
+    args = parser.parse_args()
+
+    store = JobStore(args.database)
+    now = int(time.time())
+    try:
+        if args.command == "find":
+            jobs = store.find_jobs(
+                company=args.company,
+                title=args.title,
+                min_yearly_salary=args.min_salary,
+                created_since=now - args.created_days * 86400 if args.created_days else None,
+                seen_since=now - args.seen_days * 86400 if args.seen_days else None,
+                limit=args.limit,
+            )
+        elif args.command == "search":
+            jobs = store.search(args.text, args.min_salary, args.min_rating, limit=args.limit)
+        elif args.command == "history":
+            jobs = store.job_history(args.job_key)
+        else:
+            print(f"Alert {store.add_alert(args.text, args.min_salary, args.min_rating)} saved")
+            jobs = []
+    except ValueError as e:
+        # Invalid full-text queries
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for job in jobs:
+        print(json.dumps(job))
@@ -2,11 +2,23 @@ import logging
 from logging.handlers import RotatingFileHandler
 import os
 
+class LazyRotatingFileHandler(RotatingFileHandler):
+    """
+    A RotatingFileHandler that creates its directory and opens its file on the first record.
+
+    Importing the application then costs no file system access, which keeps short
+    command line runs fast.
+    """
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
 def setup_logger(name, log_file, level=logging.INFO):
-    # Create a 'logs' directory if it doesn't exist
+    # The 'logs' directory is created with the first log record, see LazyRotatingFileHandler
     log_directory = "logs"
-    if not os.path.exists(log_directory):
-        os.makedirs(log_directory)
 
     # Construct the full path for the log file
     full_path = os.path.join(log_directory, log_file)
@@ -17,7 +29,7 @@ def setup_logger(name, log_file, level=logging.INFO):
 
     # Create a file handler that rotates the log file when it reaches 1MB
     # and keeps up to 5 backup log files
-    file_handler = RotatingFileHandler(full_path, maxBytes=1024 * 1024, backupCount=5)
+    file_handler = LazyRotatingFileHandler(full_path, maxBytes=1024 * 1024, backupCount=5)
     
     # Create a console handler for outputting logs to the console
     console_handler = logging.StreamHandler()
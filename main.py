@@ -1,28 +1,40 @@
-from scheduler import start_scheduler, run_one_time_scrape
 import os
 
+from scheduler import start_scheduler, run_one_time_scrape
+from work_queue import start_coordinator, start_worker
+
 if __name__ == "__main__":
 
     tasks = [
         ("job_title", "location"),
         ("job_title_2", "location_2"),
     ]
+    # Shortest and longest interval between two runs of a search. Each search runs as often as its
+    # posting rate needs to find about target_new_jobs_per_run new jobs per run
     run_every_minutes = 3
+    max_interval_minutes = 24 * 60
+    target_new_jobs_per_run = 1.0
+    # Scrapfly credits per hour for all searches together, intervals are stretched to stay within it. None means no limit
+    credit_budget_per_hour = None
     staggering_minutes = 5
+    # Pages in flight across all searches. None reads the concurrency of the Scrapfly account
+    max_concurrent_pages = None
+    # Processes parsing search pages. None parses on the event loop, which is faster unless pages are unusually large
+    parse_workers = None
+    # Prometheus metrics are served at http://127.0.0.1:<metrics_port>/metrics. None disables the endpoint
+    metrics_port = 9108
 
-    # Check that the number of searches is within limits for threads - The tasks of displaying an alert and waiting for user input
-    # are IO-bound tasks (not CPU intensive). In this case, it is usually ok to have 2 to 3 times the number of logical processors.
-    logical_processors = os.cpu_count() 
-    max_possible_threads = logical_processors * 2.5
-    # The number 2 represents the main thread and the GUI thread
-    max_possible_alert_workers = max_possible_threads - 2
-
-    if len(tasks) <= max_possible_alert_workers:
-        print("The amount of searches is within safe limits.. starting scrap")
-        # Each task represents a gui alert thread
-        start_scheduler(tasks, run_every_minutes, staggering_minutes, len(tasks))
+    # SCHEDULER_ROLE=coordinator publishes due searches to Redis and SCHEDULER_ROLE=worker scrapes them, so searches can
+    # be spread over several processes or machines sharing one Redis. Without it everything runs in this process.
+    role = os.getenv("SCHEDULER_ROLE", "local")
+    if role == "coordinator":
+        start_coordinator(tasks, run_every_minutes, staggering_minutes, metrics_port, max_interval_minutes,
+                          target_new_jobs_per_run, credit_budget_per_hour)
+    elif role == "worker":
+        # Each worker gets its own share of the Scrapfly concurrency, set max_concurrent_pages accordingly
+        start_worker(max_concurrent_pages=max_concurrent_pages, parse_workers=parse_workers, metrics_port=metrics_port)
     else:
-        print("The amount of searches is not within limits.. not scraping. \nReduce your job searches and try again.")
-        exit()
+        start_scheduler(tasks, run_every_minutes, staggering_minutes, max_concurrent_pages, metrics_port, max_interval_minutes,
+                        target_new_jobs_per_run, credit_budget_per_hour, parse_workers)
 
     # run_one_time_scrape("software_development", "tampa")
@@ -0,0 +1,174 @@
+import time
+import asyncio
+import functools
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from logging_config import app_logger
+
+logger = app_logger.getChild('metrics')
+
+# The search being scraped in the current task. Set once in scrape_search; tasks created from there
+# inherit it, so page fetches and Redis calls are labeled without passing the search around.
+current_search: ContextVar[str] = ContextVar("current_search", default="")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+class Metric:
+    """
+    Base class of the metrics, holding one value per combination of label values.
+
+    Values live in plain dicts. Scrape tasks update them and the metrics endpoint reads them,
+    all from the same event loop.
+    """
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        registry[name] = self
+
+    def _label_values(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label_name, "")) for label_name in self.label_names)
+
+    def _format_labels(self, label_values: Tuple[str, ...], extra: Optional[Dict[str, str]] = None) -> str:
+        pairs = list(zip(self.label_names, label_values)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.metric_type}\n"
+        return header + "".join(self._render_samples())
+
+    def _render_samples(self):
+        raise NotImplementedError
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self.values = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        label_values = self._label_values(labels)
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._label_values(labels), 0)
+
+    def _render_samples(self):
+        for label_values, value in self.values.items():
+            yield f"{self.name}{self._format_labels(label_values)} {value}\n"
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = buckets
+        # label values -> [count per bucket..., sum, count]
+        self.values = {}
+
+    def observe(self, value: float, **labels) -> None:
+        label_values = self._label_values(labels)
+        values = self.values.setdefault(label_values, [0] * len(self.buckets) + [0.0, 0])
+        for index, bucket in enumerate(self.buckets):
+            if value <= bucket:
+                values[index] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, **labels)
+
+    def _render_samples(self):
+        for label_values, values in self.values.items():
+            for bucket, count in zip(self.buckets, values):
+                yield f"{self.name}_bucket{self._format_labels(label_values, {'le': str(bucket)})} {count}\n"
+            yield f"{self.name}_bucket{self._format_labels(label_values, {'le': '+Inf'})} {values[-1]}\n"
+            yield f"{self.name}_sum{self._format_labels(label_values)} {values[-2]}\n"
+            yield f"{self.name}_count{self._format_labels(label_values)} {values[-1]}\n"
+
+registry: Dict[str, Metric] = {}
+
+stage_seconds = Histogram("scraper_stage_seconds", "Time spent in each stage of a search.", ("search", "stage"))
+page_fetch_seconds = Histogram("scraper_page_fetch_seconds", "Latency of a single Scrapfly request.", ("search",))
+parse_seconds = Histogram("scraper_parse_seconds", "Time spent parsing a search page.", ("search",))
+redis_call_seconds = Histogram("scraper_redis_call_seconds", "Latency of Redis operations.", ("operation",))
+pages_total = Counter("scraper_pages_total", "Pages fetched.", ("search",))
+unchanged_pages_total = Counter("scraper_unchanged_pages_total", "Pages whose job cards did not change since the last fetch.", ("search",))
+bytes_total = Counter("scraper_bytes_total", "Bytes of page content fetched.", ("search",))
+credits_total = Counter("scraper_scrapfly_credits_total", "Scrapfly credits spent.", ("search",))
+new_jobs_total = Counter("scraper_new_jobs_total", "New jobs found.", ("search",))
+profile_requests_total = Counter("scraper_profile_requests_total", "Scrapfly requests by URL pattern, request profile and outcome.",
+                                 ("pattern", "profile", "outcome"))
+profile_fetch_seconds = Histogram("scraper_profile_fetch_seconds", "Latency of Scrapfly requests by URL pattern and request profile.",
+                                  ("pattern", "profile"))
+profile_credits_total = Counter("scraper_profile_credits_total", "Scrapfly credits spent by URL pattern and request profile.",
+                                ("pattern", "profile"))
+page_retries_total = Counter("scraper_page_retries_total", "Scrapfly requests retried after a failure.", ("search",))
+failed_pages_total = Counter("scraper_failed_pages_total", "Pages that still failed after their retries.", ("search",))
+searches_total = Counter("scraper_searches_total", "Finished searches by outcome.", ("search", "outcome"))
+
+def observe_stage(stage: str):
+    """Time a block of a search as one stage, labeled with the current search."""
+    return stage_seconds.time(search=current_search.get(), stage=stage)
+
+def timed_redis_call(function):
+    """Decorator recording the latency of an async Redis helper under its function name."""
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        with redis_call_seconds.time(operation=function.__name__):
+            return await function(*args, **kwargs)
+    return wrapper
+
+def render_metrics() -> str:
+    return "".join(metric.render() for metric in registry.values())
+
+async def handle_metrics_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await reader.readline()
+        # The rest of the request (headers) is not needed
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+        if request_line.split(b" ")[1:2] == [b"/metrics"]:
+            status, body = "200 OK", render_metrics()
+        else:
+            status, body = "404 Not Found", "Not found, metrics are served at /metrics\n"
+
+        payload = body.encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("utf-8") + payload
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.error(f"Failed to serve metrics: {e}")
+    finally:
+        writer.close()
+
+async def start_metrics_server(port: int, host: str = "127.0.0.1") -> asyncio.AbstractServer:
+    """
+    Serve the metrics in Prometheus text format at http://host:port/metrics from the running event loop.
+
+    Args:
+        port (int): The port to listen on.
+        host (str): The interface to listen on. Use 0.0.0.0 to expose the metrics outside a container.
+
+    Returns:
+        asyncio.AbstractServer: The running server.
+    """
+    server = await asyncio.start_server(handle_metrics_request, host, port)
+    logger.info(f"Serving metrics at http://{host}:{port}/metrics")
+    return server
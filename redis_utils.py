@@ -1,16 +1,34 @@
 import redis
+import redis.asyncio
 import time
+import asyncio
 import json
 import os
 
 from logging_config import app_logger
 from colorama import Fore
 from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
 from docker_utils import DockerEnvironment
+from metrics import timed_redis_call
+from scrape_archive import scrape_archive
 
 # Set up logging
 logger = app_logger.getChild('redis')
 
+# Number of job keys sent to Redis per command when checking or marking seen jobs
+SEEN_JOBS_BATCH_SIZE = 500
+# Maximum number of connections the asyncio client opens to Redis
+ASYNC_POOL_MAX_CONNECTIONS = 50
+# Replays use their own database, so replaying an archive never marks jobs as seen or changes the
+# schedule of the live searches
+LIVE_REDIS_DB = 0
+REPLAY_REDIS_DB = int(os.getenv("REPLAY_REDIS_DB", 1))
+
+def get_redis_db() -> int:
+    """Return the Redis database of the current scrape mode, see REPLAY_REDIS_DB."""
+    return REPLAY_REDIS_DB if scrape_archive.is_replaying else LIVE_REDIS_DB
+
 class RedisConnection:
     """
     A singleton class that manages the Redis connection.
@@ -34,13 +52,14 @@ class RedisConnection:
 
         Note:
             - Uses 'redis' as host when running in Docker, 'localhost' otherwise
+            - Uses REPLAY_REDIS_DB instead of database 0 when replaying an archive
             - Connection is created only once and reused for subsequent calls
             - Performs a ping test to verify connection is working
         """
         if self._redis_client is None:
             try:
                 host = 'redis' if DockerEnvironment.is_running_in_docker() else 'localhost'
-                self._redis_client = redis.Redis(host=host, port=6379, db=0)
+                self._redis_client = redis.Redis(host=host, port=6379, db=get_redis_db())
                 # Test the connection. If connection fails, error will happen here.
                 self._redis_client.ping()  
 
@@ -53,8 +72,69 @@ class RedisConnection:
                 raise
         return self._redis_client
     
-# Create a singleton instance
+class AsyncRedisConnection:
+    """
+    A singleton class that manages the asyncio Redis connection pool.
+
+    The asyncio counterpart of RedisConnection, used by everything that runs inside the
+    event loop (scheduler and scraper) so that waiting on Redis never blocks in-flight scrapes.
+    RedisConnection stays in use for the GUI alert threads.
+    """
+    def __init__(self):
+        """Initialize AsyncRedisConnection with no active connection."""
+        self._redis_client = None
+        # Created in the event loop of the first call, like the client
+        self._connect_lock = None
+
+    async def get_connection(self) -> redis.asyncio.Redis:
+        """
+        Get or create an asyncio Redis client backed by a connection pool.
+
+        Returns:
+            redis.asyncio.Redis: An active asyncio Redis client.
+
+        Raises:
+            redis.ConnectionError: If unable to establish connection to Redis.
+
+        Note:
+            - Uses 'redis' as host when running in Docker, 'localhost' otherwise
+            - Uses REPLAY_REDIS_DB instead of database 0 when replaying an archive
+            - The client is bound to the event loop it is first used in
+            - Performs a ping test to verify connection is working
+            - Concurrent first calls wait on a lock, so only one pool is ever created
+        """
+        if self._redis_client is not None:
+            return self._redis_client
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._redis_client is None:
+                try:
+                    host = 'redis' if DockerEnvironment.is_running_in_docker() else 'localhost'
+                    pool = redis.asyncio.ConnectionPool(host=host, port=6379, db=get_redis_db(),
+                                                        max_connections=ASYNC_POOL_MAX_CONNECTIONS)
+                    redis_client = redis.asyncio.Redis(connection_pool=pool)
+                    # Test the connection. If connection fails, error will happen here.
+                    await redis_client.ping()
+                    self._redis_client = redis_client
+
+                    logger.info(Fore.YELLOW + f"Successfully connected to Redis with an asyncio pool ({host})")
+                except redis.ConnectionError as e:
+                    logger.error(Fore.RED + f"Failed to connect to Redis: {e}")
+                    raise
+        return self._redis_client
+
+    async def close(self) -> None:
+        """Close the connection pool, e.g. before the event loop it was created in is closed."""
+        if self._redis_client is not None:
+            await self._redis_client.aclose()
+            self._redis_client = None
+        # A later run may use another event loop
+        self._connect_lock = None
+
+# Create singleton instances
 redis_connection = RedisConnection()
+async_redis_connection = AsyncRedisConnection()
 
 def set_state(state_type: str, job_type: str, location: str, value: int) -> None:
     """
@@ -134,6 +214,58 @@ def get_state(state_type: str, job_type: str, location: str) -> str:
         logger.error(Fore.RED + f"Failed to get state for {key}: {e}")
         raise
 
+@timed_redis_call
+async def async_set_state(state_type: str, job_type: str, location: str, value: int) -> None:
+    """
+    Awaitable version of set_state for use inside the event loop.
+
+    Args:
+        state_type (str): The type of state being set.
+        job_type (str): The type of job.
+        location (str): The location for the job.
+        value (int): The value to store.
+
+    Raises:
+        redis.ConnectionError: If unable to connect to Redis.
+        redis.RedisError: For other Redis-related errors.
+    """
+    r = await async_redis_connection.get_connection()
+
+    key = f"{state_type}_{job_type}_{location}"
+    try:
+        await r.set(key, value)
+        logger.info(Fore.YELLOW + f"Successfully set state for {key}")
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to set state for {key}: {e}")
+        raise
+
+@timed_redis_call
+async def async_get_state(state_type: str, job_type: str, location: str) -> str:
+    """
+    Awaitable version of get_state for use inside the event loop.
+
+    Args:
+        state_type (str): The type of state being retrieved.
+        job_type (str): The type of job.
+        location (str): The location for the job.
+
+    Returns:
+        str or None: The decoded string value if the key exists, None otherwise.
+
+    Raises:
+        redis.ConnectionError: If unable to connect to Redis.
+    """
+    r = await async_redis_connection.get_connection()
+
+    key = f"{state_type}_{job_type}_{location}"
+    try:
+        value = await r.get(key)
+        logger.info(Fore.YELLOW + f"Successfully retrieved state for {key}")
+        return value.decode('utf-8') if value else None
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to get state for {key}: {e}")
+        raise
+
 def set_last_scrape(job_type: str, location: str) -> None:
     """
     Set the last scrape time for a specific job and location.
@@ -180,6 +312,18 @@ def should_scrape_by_jobs_state(job_type: str, location: str) -> bool:
         bool: True if there is no scrap history or jobs have been viewed, False otherwise.
     """
     state = get_state("jobs_viewed", job_type, location)
+    return is_jobs_state_ready(state)
+
+def is_jobs_state_ready(state: Optional[str]) -> bool:
+    """
+    Interpret a jobs viewed state, see should_scrape_by_jobs_state.
+
+    Args:
+        state (str or None): The decoded jobs viewed state.
+
+    Returns:
+        bool: True if there is no scrap history or jobs have been viewed, False otherwise.
+    """
     # None = no scrap history
     # 1 = jobs viewed
     # 0 = jobs not viewed
@@ -200,11 +344,487 @@ def should_scrape_by_time(job_type: str, location: str, interval_seconds: int) -
         bool: True if enough time has passed since the last scrape or if no last scrape is recorded.
     """
     last_scrape = get_state("last_scrape", job_type, location)
-    if last_scrape is None:
+    return is_interval_elapsed(last_scrape, interval_seconds)
+
+def is_interval_elapsed(last_time: Optional[str], interval_seconds: int) -> bool:
+    """
+    Check whether interval_seconds have passed since a stored timestamp.
+
+    Args:
+        last_time (str or None): The decoded timestamp in seconds, None if it was never set.
+        interval_seconds (int): The interval in seconds.
+
+    Returns:
+        bool: True if enough time has passed or if no timestamp is recorded.
+    """
+    if last_time is None:
         return True
     # the number of seconds that have elapsed since the last scrape >= to the given interval
     # the program should wait to scrape again
-    return (int(time.time()) - int(last_scrape)) >= interval_seconds
+    return (int(time.time()) - int(last_time)) >= interval_seconds
+
+async def set_last_full_sweep(job_type: str, location: str) -> None:
+    """
+    Set the time of the last full sweep (every page scraped) for a specific job and location.
+
+    Args:
+        job_type (str): The type of job.
+        location (str): The location for the job.
+    """
+    value = int(time.time())
+    state_type = "last_full_sweep"
+    await async_set_state(state_type, job_type, location, value)
+
+async def should_full_sweep(job_type: str, location: str, interval_seconds: int) -> bool:
+    """
+    Determine if an incremental search should scrape every page instead of stopping early.
+
+    Args:
+        job_type (str): The type of job.
+        location (str): The location for the job.
+        interval_seconds (int): The maximum interval in seconds between full sweeps.
+
+    Returns:
+        bool: True if enough time has passed since the last full sweep or if no full sweep is recorded.
+    """
+    last_full_sweep = await async_get_state("last_full_sweep", job_type, location)
+    return is_interval_elapsed(last_full_sweep, interval_seconds)
+
+def get_seen_jobs_key(job_type: str, location: str, global_scope: bool = False) -> str:
+    """
+    Build the Redis key of the seen-jobs index for a search.
+
+    Args:
+        job_type (str): The type of job.
+        location (str): The location for the job.
+        global_scope (bool): If True, return the index shared by every search.
+
+    Returns:
+        str: The Redis key of the sorted set holding the seen job keys.
+    """
+    if global_scope:
+        return "seen_jobs_global"
+    return f"seen_jobs_{job_type}_{location}"
+
+@timed_redis_call
+async def find_seen_job_keys(seen_jobs_key: str, job_keys: List[str]) -> Set[str]:
+    """
+    Return which of the given job keys are already in the seen-jobs index.
+
+    Args:
+        seen_jobs_key (str): The Redis key of the seen-jobs index.
+        job_keys (List[str]): The job keys to check.
+
+    Returns:
+        Set[str]: The subset of job_keys that has been seen before.
+
+    Raises:
+        redis.RedisError: If there is an error reading from Redis.
+
+    Note:
+        The index is a sorted set scored by the last time each key was seen. Membership is checked
+        with ZMSCORE in batches of SEEN_JOBS_BATCH_SIZE, so the cost is proportional to the number
+        of keys checked and not to the size of the index.
+    """
+    r = await async_redis_connection.get_connection()
+    seen_keys = set()
+
+    try:
+        for batch_start in range(0, len(job_keys), SEEN_JOBS_BATCH_SIZE):
+            batch = job_keys[batch_start:batch_start + SEEN_JOBS_BATCH_SIZE]
+            scores = await r.zmscore(seen_jobs_key, batch)
+            seen_keys.update(job_key for job_key, score in zip(batch, scores) if score is not None)
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to check seen jobs in {seen_jobs_key}: {e}")
+        raise
+
+    return seen_keys
+
+@timed_redis_call
+async def mark_jobs_as_seen(seen_jobs_key: str, job_keys: List[str], max_age_days: int) -> None:
+    """
+    Add job keys to the seen-jobs index and forget keys that have not been seen for max_age_days.
+
+    Args:
+        seen_jobs_key (str): The Redis key of the seen-jobs index.
+        job_keys (List[str]): The job keys seen in the current run.
+        max_age_days (int): Number of days a key is remembered after it was last seen.
+
+    Raises:
+        redis.RedisError: If there is an error writing to Redis.
+    """
+    r = await async_redis_connection.get_connection()
+    now = int(time.time())
+    max_age_seconds = max_age_days * 24 * 60 * 60
+
+    try:
+        pipeline = r.pipeline()
+        for batch_start in range(0, len(job_keys), SEEN_JOBS_BATCH_SIZE):
+            batch = job_keys[batch_start:batch_start + SEEN_JOBS_BATCH_SIZE]
+            pipeline.zadd(seen_jobs_key, {job_key: now for job_key in batch})
+        pipeline.zremrangebyscore(seen_jobs_key, "-inf", now - max_age_seconds)
+        # If the search stops running, the whole index goes away after the same window
+        pipeline.expire(seen_jobs_key, max_age_seconds)
+        await pipeline.execute()
+        logger.info(Fore.YELLOW + f"Successfully marked {len(job_keys)} jobs as seen in {seen_jobs_key}")
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to mark jobs as seen in {seen_jobs_key}: {e}")
+        raise
+
+@timed_redis_call
+async def seed_seen_jobs(seen_jobs_key: str, source: str, job_keys: List[str], max_age_days: int) -> bool:
+    """
+    Add job keys from before the seen-jobs index existed, once per index and source.
+
+    Args:
+        seen_jobs_key (str): The Redis key of the seen-jobs index.
+        source (str): What the keys come from, e.g. the location of a job key file. The global index is
+            seeded from several sources.
+        job_keys (List[str]): The job keys to add.
+        max_age_days (int): Number of days the keys are remembered, see mark_jobs_as_seen.
+
+    Returns:
+        bool: True if the keys were added, False if the index was already seeded from this source.
+
+    Raises:
+        redis.RedisError: If there is an error reading from or writing to Redis.
+
+    Note:
+        A marker key set with SET NX records the seeding, so concurrent processes seed an index from
+        a source only once. If adding the keys fails, the marker is removed so the next run tries again.
+    """
+    r = await async_redis_connection.get_connection()
+    seeded_key = f"{seen_jobs_key}_seeded_{source}"
+    try:
+        if not await r.set(seeded_key, int(time.time()), nx=True):
+            return False
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to check whether {seen_jobs_key} was seeded: {e}")
+        raise
+
+    try:
+        await mark_jobs_as_seen(seen_jobs_key, job_keys, max_age_days)
+    except redis.RedisError:
+        await r.delete(seeded_key)
+        raise
+    return True
+
+@timed_redis_call
+async def get_cached_page(url: str) -> Optional[Tuple[str, List[str]]]:
+    """
+    Retrieve the content hash and job keys of the last fetch of a search page.
+
+    Args:
+        url (str): The URL of the search page.
+
+    Returns:
+        Tuple[str, List[str]] or None: The content hash and the job keys of the page,
+        or None if the page is not cached.
+
+    Raises:
+        redis.RedisError: If there is an error reading from Redis.
+
+    Note:
+        Job keys are stored as a comma separated string, so a cache hit costs no JSON decoding.
+    """
+    r = await async_redis_connection.get_connection()
+    key = f"page_cache_{url}"
+    try:
+        cached_page = await r.hgetall(key)
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to get cached page for {url}: {e}")
+        raise
+
+    if not cached_page:
+        return None
+    job_keys = cached_page[b"job_keys"].decode('utf-8')
+    return cached_page[b"content_hash"].decode('utf-8'), job_keys.split(",") if job_keys else []
+
+@timed_redis_call
+async def set_cached_pages(pages: List[Tuple[str, str, List[str]]], ttl_seconds: int) -> None:
+    """
+    Cache the content hash and job keys of fetched search pages in a single round trip.
+
+    Args:
+        pages (List[Tuple[str, str, List[str]]]): (url, content hash, job keys) of each page.
+        ttl_seconds (int): Number of seconds each page stays cached.
+
+    Raises:
+        redis.RedisError: If there is an error writing to Redis.
+    """
+    if not pages:
+        return
+
+    r = await async_redis_connection.get_connection()
+    try:
+        pipeline = r.pipeline()
+        for url, content_hash, job_keys in pages:
+            key = f"page_cache_{url}"
+            pipeline.hset(key, mapping={"content_hash": content_hash, "job_keys": ",".join(job_keys)})
+            pipeline.expire(key, ttl_seconds)
+        await pipeline.execute()
+        logger.info(Fore.YELLOW + f"Successfully cached {len(pages)} pages")
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to cache pages: {e}")
+        raise
+
+# Field of a checkpoint hash holding the time its run started writing it
+CHECKPOINT_STARTED_FIELD = "__started"
+
+def get_checkpoint_key(job_type: str, location: str) -> str:
+    """
+    Get the Redis key of the checkpoint of a search, see save_checkpoint_page.
+
+    Args:
+        job_type (str): The type of job.
+        location (str): The location for the job.
+
+    Returns:
+        str: The checkpoint hash key.
+    """
+    return f"scrape_checkpoint_{job_type}_{location}"
+
+@timed_redis_call
+async def get_checkpoint(checkpoint_key: str, max_age_seconds: int) -> Dict[str, Tuple[List[str], List[dict]]]:
+    """
+    Retrieve the pages finished by an interrupted run of a search.
+
+    Args:
+        checkpoint_key (str): The checkpoint key, see get_checkpoint_key.
+        max_age_seconds (int): A checkpoint whose run started longer ago than this is stale. It is
+            deleted and no pages are returned.
+
+    Returns:
+        Dict[str, Tuple[List[str], List[dict]]]: The job keys and job cards of each finished page, keyed by URL.
+
+    Raises:
+        redis.RedisError: If there is an error reading from Redis.
+    """
+    r = await async_redis_connection.get_connection()
+    try:
+        pages = await r.hgetall(checkpoint_key)
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to get checkpoint {checkpoint_key}: {e}")
+        raise
+
+    started = pages.pop(CHECKPOINT_STARTED_FIELD.encode('utf-8'), None)
+    if started is None or time.time() - float(started) > max_age_seconds:
+        # Each write refreshes the TTL of the hash, so its age is checked against the start of its run
+        if pages:
+            await r.delete(checkpoint_key)
+        return {}
+
+    checkpoint = {}
+    for url, page in pages.items():
+        page = json.loads(page)
+        checkpoint[url.decode('utf-8')] = (page["job_keys"], page["results"])
+    return checkpoint
+
+@timed_redis_call
+async def save_checkpoint_page(checkpoint_key: str, url: str, job_keys: List[str], results: List[dict], ttl_seconds: int) -> None:
+    """
+    Add a finished page to the checkpoint of a search.
+
+    Args:
+        checkpoint_key (str): The checkpoint key, see get_checkpoint_key.
+        url (str): The URL of the page.
+        job_keys (List[str]): The job keys of the page.
+        results (List[dict]): The job cards of the page, empty if it was unchanged since the last fetch.
+        ttl_seconds (int): Number of seconds the checkpoint is kept after its last page was added.
+
+    Raises:
+        redis.RedisError: If there is an error writing to Redis.
+
+    Note:
+        A run that finishes deletes its checkpoint with delete_checkpoint, even when some of its pages
+        failed. A run that crashes leaves it behind, and the next run within ttl_seconds of the start
+        of the crashed run only fetches the missing pages.
+    """
+    r = await async_redis_connection.get_connection()
+    try:
+        pipeline = r.pipeline()
+        pipeline.hsetnx(checkpoint_key, CHECKPOINT_STARTED_FIELD, time.time())
+        pipeline.hset(checkpoint_key, url, json.dumps({"job_keys": job_keys, "results": results}))
+        pipeline.expire(checkpoint_key, ttl_seconds)
+        await pipeline.execute()
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to save page {url} to checkpoint {checkpoint_key}: {e}")
+        raise
+
+@timed_redis_call
+async def delete_checkpoint(checkpoint_key: str) -> None:
+    """
+    Delete the checkpoint of a search once a run finished all its pages.
+
+    Args:
+        checkpoint_key (str): The checkpoint key, see get_checkpoint_key.
+
+    Raises:
+        redis.RedisError: If there is an error writing to Redis.
+    """
+    r = await async_redis_connection.get_connection()
+    try:
+        await r.delete(checkpoint_key)
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to delete checkpoint {checkpoint_key}: {e}")
+        raise
+
+@timed_redis_call
+async def get_request_profile_level(pattern: str) -> Tuple[int, float]:
+    """
+    Retrieve the request profile level a kind of URL currently needs, see request_profiles.
+
+    Args:
+        pattern (str): The URL pattern.
+
+    Returns:
+        Tuple[int, float]: The profile level and the time it was set. Level 0 (the cheapest
+        profile) if no level is stored.
+
+    Raises:
+        redis.RedisError: If there is an error reading from Redis.
+    """
+    r = await async_redis_connection.get_connection()
+    try:
+        stored = await r.hgetall(f"request_profile_{pattern}")
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to get the request profile of {pattern}: {e}")
+        raise
+
+    if not stored:
+        return 0, time.time()
+    return int(stored[b"level"]), float(stored[b"since"])
+
+@timed_redis_call
+async def set_request_profile_level(pattern: str, level: int, ttl_seconds: int) -> None:
+    """
+    Save the request profile level a kind of URL needs, shared by every process.
+
+    Args:
+        pattern (str): The URL pattern.
+        level (int): The profile level.
+        ttl_seconds (int): Number of seconds the level is kept, after which requests start from the cheapest profile.
+
+    Raises:
+        redis.RedisError: If there is an error writing to Redis.
+    """
+    r = await async_redis_connection.get_connection()
+    key = f"request_profile_{pattern}"
+    try:
+        pipeline = r.pipeline()
+        pipeline.hset(key, mapping={"level": level, "since": time.time()})
+        pipeline.expire(key, ttl_seconds)
+        await pipeline.execute()
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to save the request profile of {pattern}: {e}")
+        raise
+
+@timed_redis_call
+async def get_cached_job_descriptions(job_keys: List[str]) -> Dict[str, str]:
+    """
+    Retrieve the cached descriptions of the given jobs in one round trip.
+
+    Args:
+        job_keys (List[str]): The job keys to look up.
+
+    Returns:
+        Dict[str, str]: The cached description of each job key found in the cache.
+
+    Raises:
+        redis.RedisError: If there is an error reading from Redis.
+    """
+    if not job_keys:
+        return {}
+
+    r = await async_redis_connection.get_connection()
+    try:
+        values = await r.mget([f"job_description_{job_key}" for job_key in job_keys])
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to get cached job descriptions: {e}")
+        raise
+
+    return {job_key: value.decode('utf-8') for job_key, value in zip(job_keys, values) if value is not None}
+
+@timed_redis_call
+async def set_cached_job_descriptions(descriptions: Dict[str, str], ttl_seconds: int) -> None:
+    """
+    Cache cleaned job descriptions by job key in a single round trip.
+
+    Args:
+        descriptions (Dict[str, str]): The description of each job key.
+        ttl_seconds (int): Number of seconds each description stays cached.
+
+    Raises:
+        redis.RedisError: If there is an error writing to Redis.
+    """
+    if not descriptions:
+        return
+
+    r = await async_redis_connection.get_connection()
+    try:
+        pipeline = r.pipeline()
+        for job_key, description in descriptions.items():
+            pipeline.set(f"job_description_{job_key}", description, ex=ttl_seconds)
+        await pipeline.execute()
+        logger.info(Fore.YELLOW + f"Successfully cached {len(descriptions)} job descriptions")
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to cache job descriptions: {e}")
+        raise
+
+@timed_redis_call
+async def get_simhash_candidates(band_keys: List[str]) -> Dict[str, Set[int]]:
+    """
+    Retrieve the simhashes stored under each band key in one round trip.
+
+    Args:
+        band_keys (List[str]): The Redis keys of the simhash bands to look up.
+
+    Returns:
+        Dict[str, Set[int]]: The simhashes stored under each band key.
+
+    Raises:
+        redis.RedisError: If there is an error reading from Redis.
+    """
+    if not band_keys:
+        return {}
+
+    r = await async_redis_connection.get_connection()
+    try:
+        pipeline = r.pipeline()
+        for band_key in band_keys:
+            pipeline.smembers(band_key)
+        members = await pipeline.execute()
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to get simhash candidates: {e}")
+        raise
+
+    return {band_key: {int(value) for value in values} for band_key, values in zip(band_keys, members)}
+
+@timed_redis_call
+async def add_simhashes(band_entries: Dict[str, List[int]], ttl_seconds: int) -> None:
+    """
+    Add simhashes under their band keys in one round trip.
+
+    Args:
+        band_entries (Dict[str, List[int]]): The simhashes to add under each band key.
+        ttl_seconds (int): Number of seconds a band is kept after it was last updated.
+
+    Raises:
+        redis.RedisError: If there is an error writing to Redis.
+    """
+    if not band_entries:
+        return
+
+    r = await async_redis_connection.get_connection()
+    try:
+        pipeline = r.pipeline()
+        for band_key, values in band_entries.items():
+            pipeline.sadd(band_key, *values)
+            pipeline.expire(band_key, ttl_seconds)
+        await pipeline.execute()
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to add simhashes: {e}")
+        raise
 
 def save_job_to_redis(job_id: str, job_report: dict) -> None:
     """
@@ -232,4 +852,358 @@ def save_job_to_redis(job_id: str, job_report: dict) -> None:
         logger.info(Fore.YELLOW + f"Successfully saved job '{job_id}' at '{timestamp}' with response: {response}")
     except redis.RedisError as e:
         logger.error(Fore.RED + f"Failed to save job '{job_id}' at '{timestamp}' in function 'save_job_to_redis'. Error: {e}. Job description: {job_description}")
-        raise
\ No newline at end of file
+        raise
+
+@timed_redis_call
+async def async_save_job_to_redis(job_id: str, job_report: dict) -> None:
+    """
+    Awaitable version of save_job_to_redis for use inside the event loop.
+
+    Args:
+        job_id (str): The unique identifier for the job.
+        job_report (dict): The job report data to be saved.
+
+    Raises:
+        redis.RedisError: If there is an error saving to Redis.
+    """
+    job_description = json.dumps(job_report)
+    timestamp = datetime.now().strftime('%Y-%m-%d-%H:%M:%S')
+    key = f"job:{job_id}_{timestamp}"
+
+    try:
+        r = await async_redis_connection.get_connection()
+        response = await r.json().set(key, "$", job_description)
+        logger.info(Fore.YELLOW + f"Successfully saved job '{job_id}' at '{timestamp}' with response: {response}")
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to save job '{job_id}' at '{timestamp}' in function 'async_save_job_to_redis'. Error: {e}. Job description: {job_description}")
+        raise
+
+@timed_redis_call
+async def get_searches_to_scrape(searches: List[Tuple[str, str]], interval_seconds: int) -> Dict[Tuple[str, str], bool]:
+    """
+    Determine which searches should be scraped, reading the state of every search in one round trip.
+
+    Args:
+        searches (List[Tuple[str, str]]): (job_type, location) of each search.
+        interval_seconds (int): The minimum interval in seconds between scrapes.
+
+    Returns:
+        Dict[Tuple[str, str], bool]: For each search, True if both should_scrape_by_jobs_state
+        and should_scrape_by_time would return True.
+
+    Raises:
+        redis.RedisError: If there is an error reading from Redis.
+
+    Note:
+        The jobs viewed and last scrape keys of all searches are read with a single MGET
+        instead of two GET commands per search.
+    """
+    if not searches:
+        return {}
+
+    r = await async_redis_connection.get_connection()
+    keys = []
+    for job_type, location in searches:
+        keys.append(f"jobs_viewed_{job_type}_{location}")
+        keys.append(f"last_scrape_{job_type}_{location}")
+
+    try:
+        values = await r.mget(keys)
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to get the state of {len(searches)} searches: {e}")
+        raise
+
+    values = [value.decode('utf-8') if value else None for value in values]
+    searches_to_scrape = {}
+    for index, search in enumerate(searches):
+        jobs_viewed, last_scrape = values[2 * index], values[2 * index + 1]
+        searches_to_scrape[search] = is_jobs_state_ready(jobs_viewed) and is_interval_elapsed(last_scrape, interval_seconds)
+
+    logger.info(Fore.YELLOW + f"Successfully retrieved state for {len(searches)} searches")
+    return searches_to_scrape
+
+@timed_redis_call
+async def get_search_rates(searches: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Tuple[Optional[float], Optional[float], Optional[float]]]:
+    """
+    Read the posting rate, run cost and last scrape time of every search in one round trip.
+
+    Args:
+        searches (List[Tuple[str, str]]): (job_type, location) of each search.
+
+    Returns:
+        Dict[Tuple[str, str], Tuple[Optional[float], Optional[float], Optional[float]]]: For each search,
+        its posting rate in new jobs per hour, the Scrapfly credits of its last run and the time of its
+        last scrape. Each value is None if it was never saved.
+
+    Raises:
+        redis.RedisError: If there is an error reading from Redis.
+    """
+    if not searches:
+        return {}
+
+    r = await async_redis_connection.get_connection()
+    keys = []
+    for job_type, location in searches:
+        keys.append(f"posting_rate_{job_type}_{location}")
+        keys.append(f"run_cost_{job_type}_{location}")
+        keys.append(f"last_scrape_{job_type}_{location}")
+
+    try:
+        values = await r.mget(keys)
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to get the posting rates of {len(searches)} searches: {e}")
+        raise
+
+    values = [float(value) if value else None for value in values]
+    return {search: tuple(values[3 * index:3 * index + 3]) for index, search in enumerate(searches)}
+
+@timed_redis_call
+async def save_finished_search(job_type: str, location: str, new_job_reports: Dict[str, dict], save_jobs: bool,
+                               posting_rate: Optional[float] = None, run_cost: Optional[float] = None) -> None:
+    """
+    Save the state of a finished search in a single pipelined transaction.
+
+    Sets the last scrape time, marks the jobs as not viewed when there are new jobs and,
+    if save_jobs is True, saves each new job report the same way as save_job_to_redis.
+
+    Args:
+        job_type (str): The type of job.
+        location (str): The location for the job.
+        new_job_reports (Dict[str, dict]): The report of each new job keyed by job id.
+        save_jobs (bool): Whether to save the job reports. Requires Redis Stack (RedisJSON).
+        posting_rate (Optional[float]): The estimated new jobs per hour of the search, see get_search_rates.
+        run_cost (Optional[float]): The Scrapfly credits spent by the run.
+
+    Raises:
+        redis.RedisError: If there is an error writing to Redis.
+    """
+    r = await async_redis_connection.get_connection()
+    timestamp = datetime.now().strftime('%Y-%m-%d-%H:%M:%S')
+
+    try:
+        # MULTI/EXEC: the search state and its jobs are written together or not at all
+        pipeline = r.pipeline(transaction=True)
+        pipeline.set(f"last_scrape_{job_type}_{location}", int(time.time()))
+        if new_job_reports:
+            pipeline.set(f"jobs_viewed_{job_type}_{location}", 0)
+        if posting_rate is not None:
+            pipeline.set(f"posting_rate_{job_type}_{location}", posting_rate)
+        if run_cost is not None:
+            pipeline.set(f"run_cost_{job_type}_{location}", run_cost)
+        if save_jobs:
+            for job_id, job_report in new_job_reports.items():
+                pipeline.json().set(f"job:{job_id}_{timestamp}", "$", json.dumps(job_report))
+        await pipeline.execute()
+        logger.info(Fore.YELLOW + f"Successfully saved state for {job_type} in {location} with {len(new_job_reports)} new jobs")
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to save state for {job_type} in {location}: {e}")
+        raise
+
+@timed_redis_call
+async def ensure_consumer_group(stream: str, group: str) -> None:
+    """
+    Create a consumer group reading a stream from its start, creating the stream if needed.
+
+    Args:
+        stream (str): The stream key.
+        group (str): The consumer group name.
+
+    Raises:
+        redis.RedisError: If there is an error other than the group already existing.
+    """
+    r = await async_redis_connection.get_connection()
+    try:
+        await r.xgroup_create(stream, group, id="0", mkstream=True)
+        logger.info(Fore.YELLOW + f"Created consumer group {group} on {stream}")
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            logger.error(Fore.RED + f"Failed to create consumer group {group} on {stream}: {e}")
+            raise
+
+@timed_redis_call
+async def publish_scrape_job(stream: str, job_type: str, location: str, max_length: int) -> str:
+    """
+    Add a scrape job for a search to a stream.
+
+    Args:
+        stream (str): The stream key.
+        job_type (str): The type of job.
+        location (str): The location for the job.
+        max_length (int): Approximate number of entries kept in the stream, older ones are trimmed.
+
+    Returns:
+        str: The id of the stream entry.
+
+    Raises:
+        redis.RedisError: If there is an error writing to Redis.
+    """
+    r = await async_redis_connection.get_connection()
+    try:
+        message_id = await r.xadd(stream, {"query": job_type, "location": location}, maxlen=max_length, approximate=True)
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to publish scrape job for {job_type} in {location}: {e}")
+        raise
+    return message_id.decode('utf-8')
+
+def decode_scrape_jobs(entries) -> List[Tuple[str, str, str]]:
+    # (message id, query, location) of each stream entry. Entries trimmed while pending have no fields.
+    return [
+        (message_id.decode('utf-8'), fields[b"query"].decode('utf-8'), fields[b"location"].decode('utf-8'))
+        for message_id, fields in entries if fields
+    ]
+
+# Not timed with timed_redis_call: the command blocks until a job arrives, its latency is mostly waiting
+async def read_scrape_jobs(stream: str, group: str, consumer: str, count: int, block_ms: int) -> List[Tuple[str, str, str]]:
+    """
+    Read scrape jobs never delivered to any consumer of the group, waiting up to block_ms for one.
+
+    Args:
+        stream (str): The stream key.
+        group (str): The consumer group name.
+        consumer (str): The name of this consumer.
+        count (int): Maximum number of jobs to read.
+        block_ms (int): Milliseconds to wait when there are no jobs.
+
+    Returns:
+        List[Tuple[str, str, str]]: (message id, job_type, location) of each job. The jobs are pending
+        for this consumer until they are acknowledged with ack_scrape_job.
+
+    Raises:
+        redis.RedisError: If there is an error reading from Redis.
+    """
+    r = await async_redis_connection.get_connection()
+    try:
+        response = await r.xreadgroup(group, consumer, {stream: ">"}, count=count, block=block_ms)
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to read scrape jobs from {stream}: {e}")
+        raise
+    return [job for _, entries in response or [] for job in decode_scrape_jobs(entries)]
+
+@timed_redis_call
+async def claim_stale_scrape_jobs(stream: str, group: str, consumer: str, min_idle_ms: int, count: int) -> List[Tuple[str, str, str]]:
+    """
+    Take over jobs whose lease expired, i.e. pending jobs of any consumer idle for at least min_idle_ms.
+
+    Args:
+        stream (str): The stream key.
+        group (str): The consumer group name.
+        consumer (str): The name of this consumer.
+        min_idle_ms (int): The lease duration in milliseconds.
+        count (int): Maximum number of jobs to claim.
+
+    Returns:
+        List[Tuple[str, str, str]]: (message id, job_type, location) of each claimed job.
+
+    Raises:
+        redis.RedisError: If there is an error reading from Redis.
+
+    Note:
+        Uses XAUTOCLAIM, which requires Redis 6.2 or later. A consumer that crashed or hung
+        never renews its leases, so its jobs are picked up by the next consumer that calls this.
+    """
+    r = await async_redis_connection.get_connection()
+    try:
+        response = await r.xautoclaim(stream, group, consumer, min_idle_ms, start_id="0-0", count=count)
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to claim stale scrape jobs from {stream}: {e}")
+        raise
+    return decode_scrape_jobs(response[1])
+
+@timed_redis_call
+async def renew_scrape_job_lease(stream: str, group: str, consumer: str, message_id: str) -> bool:
+    """
+    Renew the lease of a job held by this consumer by resetting its idle time.
+
+    Args:
+        stream (str): The stream key.
+        group (str): The consumer group name.
+        consumer (str): The name of this consumer.
+        message_id (str): The id of the job.
+
+    Returns:
+        bool: False if the job is no longer held by this consumer, e.g. because its lease expired
+        and another consumer claimed it.
+
+    Raises:
+        redis.RedisError: If there is an error writing to Redis.
+    """
+    r = await async_redis_connection.get_connection()
+    try:
+        # XCLAIM takes the job whoever holds it, so first check that it is still ours
+        pending = await r.xpending_range(stream, group, min=message_id, max=message_id, count=1, consumername=consumer)
+        if not pending:
+            return False
+        await r.xclaim(stream, group, consumer, 0, [message_id], justid=True)
+        return True
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to renew the lease of scrape job {message_id}: {e}")
+        raise
+
+@timed_redis_call
+async def ack_scrape_job(stream: str, group: str, message_id: str) -> None:
+    """
+    Acknowledge a finished job, removing it from the pending jobs of the group.
+
+    Args:
+        stream (str): The stream key.
+        group (str): The consumer group name.
+        message_id (str): The id of the job.
+
+    Raises:
+        redis.RedisError: If there is an error writing to Redis.
+    """
+    r = await async_redis_connection.get_connection()
+    try:
+        await r.xack(stream, group, message_id)
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to acknowledge scrape job {message_id}: {e}")
+        raise
+
+def get_scrape_job_result_key(message_id: str) -> str:
+    return f"scrape_job_result_{message_id}"
+
+@timed_redis_call
+async def set_scrape_job_result(message_id: str, status: str, ttl_seconds: int) -> None:
+    """
+    Record how a job ended, for the publisher of the job to read back with get_scrape_job_result.
+
+    Args:
+        message_id (str): The id of the job.
+        status (str): How the job ended, e.g. "done" or "failed".
+        ttl_seconds (int): How long the result is kept.
+
+    Raises:
+        redis.RedisError: If there is an error writing to Redis.
+    """
+    r = await async_redis_connection.get_connection()
+    try:
+        await r.set(get_scrape_job_result_key(message_id), status, ex=ttl_seconds)
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to save the result of scrape job {message_id}: {e}")
+        raise
+
+@timed_redis_call
+async def get_scrape_job_result(message_id: str) -> Optional[str]:
+    """
+    Read how a job ended.
+
+    Args:
+        message_id (str): The id of the job.
+
+    Returns:
+        Optional[str]: The status saved with set_scrape_job_result, or None if the job has not ended yet.
+
+    Raises:
+        redis.RedisError: If there is an error reading from Redis.
+
+    Note:
+        The result is keyed by the id of the job rather than compared with the time of the last run,
+        so it does not depend on the clocks of the publisher and the consumer agreeing.
+    """
+    r = await async_redis_connection.get_connection()
+    try:
+        status = await r.get(get_scrape_job_result_key(message_id))
+    except redis.RedisError as e:
+        logger.error(Fore.RED + f"Failed to get the result of scrape job {message_id}: {e}")
+        raise
+    return status.decode('utf-8') if status is not None else None
@@ -0,0 +1,89 @@
+import re
+import time
+
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+from urllib.parse import urlparse
+from logging_config import app_logger
+from redis_utils import get_request_profile_level, set_request_profile_level
+
+logger = app_logger.getChild('request_profiles')
+
+@dataclass(frozen=True)
+class RequestProfile:
+    name: str
+    # Extra ScrapeConfig parameters of the profile
+    parameters: Dict = field(default_factory=dict)
+
+# Scrapfly request settings from cheapest and fastest to most expensive. A request starts at the cheapest
+# profile known to work for its kind of URL and moves to the next one when the response looks blocked.
+REQUEST_PROFILES = (
+    RequestProfile("datacenter", {"country": "us"}),
+    RequestProfile("residential", {"country": "us", "proxy_pool": "public_residential_pool"}),
+    RequestProfile("asp", {"asp": True}),
+)
+# An escalated kind of URL tries the next cheaper profile again after this long, sites unblock as well
+RETRY_CHEAPER_PROFILE_SECONDS = 30 * 60
+# How long a level read from Redis is trusted before other processes' changes are read again
+PROFILE_REFRESH_SECONDS = 60
+PROFILE_TTL_SECONDS = 24 * 60 * 60
+
+def get_url_pattern(url: str) -> str:
+    # URLs of the same kind (search pages, job links) get blocked alike, whatever their parameters
+    parsed_url = urlparse(url)
+    return re.sub(r"[^a-z0-9]+", "_", f"{parsed_url.netloc}{parsed_url.path}".lower()).strip("_")
+
+class RequestProfiles:
+    """
+    The profile level each kind of URL currently needs, shared with other processes through Redis.
+
+    Each process caches the levels for PROFILE_REFRESH_SECONDS. When two processes change the same
+    pattern at once, the last write to Redis wins, which at worst costs one more escalation.
+    """
+    def __init__(self):
+        # pattern -> (level, time the level was set, time it was read from Redis)
+        self._levels: Dict[str, Tuple[int, float, float]] = {}
+
+    async def _get(self, pattern: str) -> Tuple[int, float]:
+        now = time.time()
+        entry = self._levels.get(pattern)
+        if entry is None or now - entry[2] > PROFILE_REFRESH_SECONDS:
+            try:
+                level, since = await get_request_profile_level(pattern)
+            except Exception as e:
+                logger.warning(f"Could not read the request profile of {pattern}: {e}")
+                level, since = (entry[0], entry[1]) if entry else (0, now)
+            entry = (min(level, len(REQUEST_PROFILES) - 1), since, now)
+            self._levels[pattern] = entry
+        return entry[0], entry[1]
+
+    async def _set(self, pattern: str, level: int) -> None:
+        now = time.time()
+        self._levels[pattern] = (level, now, now)
+        logger.info(f"Requests to {pattern} start with the {REQUEST_PROFILES[level].name} profile")
+        try:
+            await set_request_profile_level(pattern, level, PROFILE_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"Could not save the request profile of {pattern}: {e}")
+
+    async def get_start_level(self, pattern: str) -> int:
+        level, since = await self._get(pattern)
+        if level > 0 and time.time() - since > RETRY_CHEAPER_PROFILE_SECONDS:
+            return level - 1
+        return level
+
+    async def record_success(self, pattern: str, level: int) -> None:
+        current_level, _ = await self._get(pattern)
+        if level < current_level:
+            await self._set(pattern, level)
+
+    async def record_block(self, pattern: str, level: int) -> None:
+        current_level, _ = await self._get(pattern)
+        if level < current_level:
+            # A cheaper profile tried by get_start_level is still blocked, wait another
+            # RETRY_CHEAPER_PROFILE_SECONDS before trying it again
+            await self._set(pattern, current_level)
+        elif level + 1 < len(REQUEST_PROFILES):
+            await self._set(pattern, level + 1)
+
+request_profiles = RequestProfiles()
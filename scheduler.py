@@ -1,57 +1,153 @@
+import time
 import asyncio
+import random
 
 from colorama import Fore
 from logging_config import app_logger
-from scrapper import scrape_search
-# TODO: gui_queue in the import is not being accessed - check this
-from gui import gui_queue, start_gui_thread, stop_gui_thread
-from redis_utils import set_last_scrape, set_jobs_as_not_viewed, should_scrape_by_jobs_state, should_scrape_by_time
+from scrapper import scrape_search, configure_page_concurrency, configure_parse_workers, shutdown_parse_workers
+from redis_utils import get_searches_to_scrape, get_search_rates, save_finished_search, async_redis_connection
+from docker_utils import DockerEnvironment
+from metrics import start_metrics_server, credits_total
+from adaptive_schedule import AdaptiveSchedule, estimate_posting_rate
 
 # from linkedin_scraper import linkedin_scrape_search, linkedin_login
 
 logger = app_logger.getChild('scheduler')
 
+# How often the scheduler checks which searches are due, and the maximum random delay before a due search starts
+SCHEDULE_POLL_SECONDS = 30
+SCHEDULE_JITTER_SECONDS = 10
+# Longest interval between two runs of a search that gets few or no new jobs
+DEFAULT_MAX_INTERVAL_MINUTES = 24 * 60
+
 async def one_time_scrape(query, location):
-    found_new_jobs = await scrape_search(query=query, location=location, radius=25)
-    return found_new_jobs
+    try:
+        new_job_reports = await scrape_search(query=query, location=location, radius=25)
+    finally:
+        shutdown_parse_workers()
+        await async_redis_connection.close()
+    return bool(new_job_reports)
 
-async def perform_scheduled_scrape(query, location, gui_queue, scraps_staggering_minutes):
-    found_new_jobs = False
+def get_create_dates(new_job_reports):
+    # createDate is missing on some cards, pubDate is the closest substitute
+    create_dates = []
+    for job_report in new_job_reports.values():
+        for key in ("createDate", "pubDate"):
+            if isinstance(job_report.get(key), (int, float)):
+                create_dates.append(job_report[key])
+                break
+    return create_dates
 
-    logger.info(Fore.MAGENTA + f"Performing scrape for {query} in {location}")
-    found_new_jobs = await scrape_search(query=query, location=location, radius=25)
-    set_last_scrape(query, location)
+async def run_scheduled_search(query, location, rate=None, last_run=None):
+    # Scrapes a search and saves its state, posting rate and cost. Used by the local scheduler and by the workers.
+    # Returns the new job reports (None if the scrape failed), the posting rate, the credits spent and the start time.
+    started = time.time()
+    credits_before = credits_total.get(search=f"{query}_{location}")
+    new_job_reports = await scrape_search(query=query, location=location, radius=25, incremental=True)
+    run_cost = credits_total.get(search=f"{query}_{location}") - credits_before
 
-    if found_new_jobs:
-        set_jobs_as_not_viewed(query, location)
-        gui_queue.put((f"New jobs found", f"New jobs found for {query} in {location}", query, location, scraps_staggering_minutes))
+    posting_rate = None
+    if new_job_reports is not None:
+        posting_rate = estimate_posting_rate(rate, get_create_dates(new_job_reports), started, last_run)
+    # Job reports are only saved when running with Redis Stack, which provides RedisJSON
+    await save_finished_search(query, location, new_job_reports or {}, DockerEnvironment.is_running_in_docker(),
+                               posting_rate, run_cost if posting_rate is not None else None)
+    return new_job_reports, posting_rate, run_cost, started
 
-async def run_schedule(scrape_tasks, run_every_minutes, scraps_staggering_minutes, max_workers):
-    start_gui_thread(max_workers)
+async def perform_scheduled_scrape(query, location, gui_queue, scraps_staggering_minutes, schedule, delay_seconds=0):
+    search = (query, location)
+    try:
+        # Per-search jitter: the task waits on its own instead of blocking the scheduler
+        await asyncio.sleep(delay_seconds)
+
+        logger.info(Fore.MAGENTA + f"Performing scrape for {query} in {location}")
+        new_job_reports, posting_rate, run_cost, started = await run_scheduled_search(
+            query, location, schedule.rates.get(search), schedule.last_runs.get(search)
+        )
+        if posting_rate is not None:
+            schedule.load(search, posting_rate, run_cost, started)
 
-    # TODO: note there might be a contradiction between the run_every_seconds and staggering_time_seconds
-    run_every_seconds = run_every_minutes * 60
-    staggering_time_seconds = scraps_staggering_minutes * 60 
+        if new_job_reports:
+            message = f"New jobs found for {query} in {location}"
+            alerts = sorted({alert for job_report in new_job_reports.values() for alert in job_report.get("keywordAlerts", [])})
+            if alerts:
+                message += f"\nKeyword alerts matched: {', '.join(alerts)}"
+            gui_queue.put((f"New jobs found", message, query, location, scraps_staggering_minutes))
+    except Exception as e:
+        # One failing search must not stop the others
+        logger.error(Fore.RED + f"Scheduled scrape failed for {query} in {location}: {e}")
+    finally:
+        schedule.reschedule(search)
+
+async def run_schedule(scrape_tasks, run_every_minutes, scraps_staggering_minutes, max_concurrent_pages=None,
+                       metrics_port=None, max_interval_minutes=DEFAULT_MAX_INTERVAL_MINUTES, target_new_jobs_per_run=1.0,
+                       credit_budget_per_hour=None, parse_workers=None):
+    # One GUI thread shows the alerts of every search, whatever the number of searches. Imported here
+    # so one-time scrapes and workers never load tkinter.
+    from gui import gui_queue, start_gui_thread, stop_gui_thread
+    start_gui_thread()
+    if metrics_port is not None:
+        await start_metrics_server(metrics_port)
+    # Searches run concurrently and share the account's Scrapfly concurrency. A cycle takes as long as
+    # the concurrency allowance needs to get through the pages, not the number of searches times the staggering.
+    await configure_page_concurrency(max_concurrent_pages)
+    # Pages are parsed on the event loop unless parse_workers sets up a pool of processes, see scrapper.parse_executor
+    configure_parse_workers(parse_workers)
+
+    # run_every_minutes is the shortest interval a search can get, busy searches run that often and
+    # quiet ones less often, up to max_interval_minutes
+    min_interval_seconds = run_every_minutes * 60
+    schedule = AdaptiveSchedule(min_interval_seconds, max_interval_minutes * 60, target_new_jobs_per_run, credit_budget_per_hour)
+    running_scrapes = {}
 
     try:
+        try:
+            for search, (rate, cost, last_run) in (await get_search_rates(scrape_tasks)).items():
+                schedule.load(search, rate, cost, last_run)
+        except Exception as e:
+            logger.error(Fore.RED + f"Could not read the posting rates of the searches, starting without them: {e}")
+        # The first scrape of each search is spread over the staggering window so searches don't all start at once
+        now = time.time()
+        for search in scrape_tasks:
+            schedule.schedule_at(search, now + random.uniform(0, scraps_staggering_minutes * 60))
+
         while True:
-            for query, location in scrape_tasks:
-                should_scrape_state = should_scrape_by_jobs_state(query, location)
-                should_scrape_time = should_scrape_by_time(query, location, run_every_seconds)
-                logger.info(Fore.YELLOW + f"Should scrape state: {should_scrape_state}, Should scrape time: {should_scrape_time}")
-
-                if should_scrape_time and should_scrape_state:
-                    await perform_scheduled_scrape(query, location, gui_queue, scraps_staggering_minutes)
-                else:
-                    logger.info(Fore.MAGENTA + f"Skipping scrape for {query} in {location}")
-                
-                await asyncio.sleep(staggering_time_seconds)
+            due_searches = schedule.pop_due(time.time())
+            if due_searches:
+                try:
+                    # The jobs viewed state of every due search is read in a single round trip
+                    searches_to_scrape = await get_searches_to_scrape(due_searches, 0)
+                except Exception as e:
+                    logger.error(Fore.RED + f"Could not read the state of the searches: {e}")
+                    searches_to_scrape = {}
+
+                for search in due_searches:
+                    query, location = search
+                    running_scrape = running_scrapes.get(search)
+                    if searches_to_scrape.get(search) and (running_scrape is None or running_scrape.done()):
+                        # The task reschedules the search once it finishes
+                        running_scrapes[search] = asyncio.create_task(perform_scheduled_scrape(
+                            query, location, gui_queue, scraps_staggering_minutes, schedule,
+                            random.uniform(0, SCHEDULE_JITTER_SECONDS)
+                        ))
+                    else:
+                        logger.debug(Fore.MAGENTA + f"Skipping scrape for {query} in {location}")
+                        schedule.schedule_at(search, time.time() + min_interval_seconds)
+
+            seconds_until_next = schedule.seconds_until_next(time.time())
+            await asyncio.sleep(SCHEDULE_POLL_SECONDS if seconds_until_next is None else min(seconds_until_next, SCHEDULE_POLL_SECONDS))
     finally:
         stop_gui_thread()
+        shutdown_parse_workers()
+        await async_redis_connection.close()
 
-def start_scheduler(scrape_tasks, run_every_minutes, scraps_staggering_minutes, max_workers):
+def start_scheduler(scrape_tasks, run_every_minutes, scraps_staggering_minutes, max_concurrent_pages=None,
+                    metrics_port=None, max_interval_minutes=DEFAULT_MAX_INTERVAL_MINUTES, target_new_jobs_per_run=1.0,
+                    credit_budget_per_hour=None, parse_workers=None):
     # To run a coroutine. Runs the top level entry point
-    asyncio.run(run_schedule(scrape_tasks, run_every_minutes, scraps_staggering_minutes, max_workers))
+    asyncio.run(run_schedule(scrape_tasks, run_every_minutes, scraps_staggering_minutes, max_concurrent_pages,
+                             metrics_port, max_interval_minutes, target_new_jobs_per_run, credit_budget_per_hour,
+                             parse_workers))
 
 def run_one_time_scrape(query, location):
     asyncio.run(one_time_scrape(query, location))
@@ -0,0 +1,147 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+
+from typing import Optional
+from logging_config import app_logger
+
+logger = app_logger.getChild('scrape_archive')
+
+LIVE_MODE = "live"
+RECORD_MODE = "record"
+REPLAY_MODE = "replay"
+
+class ArchivedResponse:
+    """
+    A Scrapfly response served from the archive.
+
+    Exposes the same `content` and `selector` attributes the scraper reads from a
+    live ScrapeApiResponse, so the parsing code does not need to know where the page came from.
+    """
+    def __init__(self, url: str, content: str):
+        self.url = url
+        self.content = content
+        self._selector = None
+
+    @property
+    def selector(self):
+        if self._selector is None:
+            # parsel pulls in lxml, only load it when a page is actually read through a selector
+            from parsel import Selector
+            self._selector = Selector(text=self.content)
+        return self._selector
+
+class ScrapeArchive:
+    """
+    A compressed on-disk archive of raw Scrapfly responses keyed by URL.
+
+    In record mode every live response is stored, in replay mode responses are served from the
+    archive without touching the network, and in live mode the archive is not used at all.
+    Each URL is stored as one gzip compressed JSON file named after the SHA-1 of the URL, so
+    recording the same URL again replaces the previous capture. Use one directory per capture
+    to keep historical pages around.
+    """
+    def __init__(self, mode: Optional[str] = LIVE_MODE, directory: str = "scrape_archive"):
+        """Initialize the archive, see configure. With mode None it is configured from the environment on first use."""
+        self._mode = None
+        self._directory = directory
+        if mode is not None:
+            self.configure(mode, directory)
+
+    def _configure_from_environment(self) -> None:
+        # Read when first needed instead of at import, so commands that never scrape don't load .env
+        from dotenv import load_dotenv
+        load_dotenv()
+        self.configure(os.getenv("SCRAPE_MODE", LIVE_MODE), os.getenv("SCRAPE_ARCHIVE_DIR", "scrape_archive"))
+
+    @property
+    def mode(self) -> str:
+        if self._mode is None:
+            self._configure_from_environment()
+        return self._mode
+
+    @property
+    def directory(self) -> str:
+        if self._mode is None:
+            self._configure_from_environment()
+        return self._directory
+
+    def configure(self, mode: str, directory: str = "scrape_archive") -> None:
+        """
+        Set the archive mode and directory.
+
+        Args:
+            mode (str): One of "live", "record" or "replay".
+            directory (str): Directory holding the archived responses.
+
+        Raises:
+            ValueError: If the mode is not a known mode.
+        """
+        if mode not in (LIVE_MODE, RECORD_MODE, REPLAY_MODE):
+            raise ValueError(f"Unknown scrape archive mode: {mode}")
+        self._mode = mode
+        self._directory = directory
+        if mode != LIVE_MODE:
+            logger.info(f"Scrape archive mode set to {mode} ({directory})")
+
+    @property
+    def is_recording(self) -> bool:
+        return self.mode == RECORD_MODE
+
+    @property
+    def is_replaying(self) -> bool:
+        return self.mode == REPLAY_MODE
+
+    def _path(self, url: str) -> str:
+        url_hash = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{url_hash}.json.gz")
+
+    def record(self, url: str, content: str) -> None:
+        """
+        Store the raw content of a response.
+
+        Args:
+            url (str): The URL that was scraped.
+            content (str): The raw response content.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {"url": url, "recorded_at": int(time.time()), "content": content}
+        with gzip.open(self._path(url), "wt", encoding="utf-8") as file:
+            json.dump(entry, file)
+
+    def replay(self, url: str) -> ArchivedResponse:
+        """
+        Load a recorded response.
+
+        Args:
+            url (str): The URL to look up.
+
+        Returns:
+            ArchivedResponse: The recorded response.
+
+        Raises:
+            KeyError: If the URL was never recorded in this archive.
+        """
+        path = self._path(url)
+        if not os.path.exists(path):
+            logger.error(f"No recorded response for {url} in {self.directory}")
+            raise KeyError(url)
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            entry = json.load(file)
+        return ArchivedResponse(entry["url"], entry["content"])
+
+    def urls(self):
+        """Yield every URL stored in the archive."""
+        if not os.path.isdir(self.directory):
+            return
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith(".json.gz"):
+                with gzip.open(os.path.join(self.directory, filename), "rt", encoding="utf-8") as file:
+                    yield json.load(file)["url"]
+
+# Create a singleton instance, configured from the environment on first use:
+# SCRAPE_MODE=live|record|replay and SCRAPE_ARCHIVE_DIR
+# Scripts can switch modes with scrape_archive.configure(mode, directory).
+scrape_archive = ScrapeArchive(None)
@@ -2,18 +2,30 @@ import os
 import json
 import re
 import time
+import random
+import asyncio
+import hashlib
 import logging
+import multiprocessing
 
-from datetime import datetime
-from dataclasses import dataclass
-from typing import Dict, List, Set
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Set, Tuple
 from urllib.parse import urlencode
 from scrapfly import ScrapflyClient, ScrapeConfig
-from ordered_set import OrderedSet
-from dotenv import load_dotenv
 from logging_config import app_logger
-from redis_utils import save_job_to_redis
+from redis_utils import set_last_full_sweep, should_full_sweep, get_seen_jobs_key, find_seen_job_keys, mark_jobs_as_seen, \
+    get_cached_page, set_cached_pages, get_cached_job_descriptions, set_cached_job_descriptions, get_checkpoint_key, \
+    get_checkpoint, save_checkpoint_page, delete_checkpoint, seed_seen_jobs
 from docker_utils import DockerEnvironment
+from scrape_archive import scrape_archive
+from fingerprints import find_reposts
+from job_store import get_job_store
+from job_record import JobRecord, compact_card
+from request_profiles import REQUEST_PROFILES, request_profiles, get_url_pattern
+from metrics import current_search, observe_stage, page_fetch_seconds, parse_seconds, pages_total, unchanged_pages_total, \
+    bytes_total, credits_total, new_jobs_total, searches_total, page_retries_total, failed_pages_total, profile_requests_total, \
+    profile_fetch_seconds, profile_credits_total
 
 @dataclass
 class ScrappingJobConfig:
@@ -23,25 +35,131 @@ class ScrappingJobConfig:
     # there's a page limit on indeed.com of 1000 results per search
     max_results: int = 1000
     directory: str = "scrapped_data"
+    # Incremental mode walks the date-sorted pages in order and stops once this many consecutive
+    # pages only contain job keys that are already known from previous runs
+    incremental: bool = False
+    known_pages_to_stop: int = 2
+    incremental_batch_pages: int = 3
+    # Safety net: an incremental search still does a full sweep of every page this often
+    full_sweep_every_minutes: int = 60
+    # Job keys are remembered per (query, location) unless global_seen_jobs is set, in which case a job
+    # reported by any search is never reported again. Keys not seen for seen_jobs_max_age_days are forgotten.
+    global_seen_jobs: bool = False
+    seen_jobs_max_age_days: int = 30
+    # Pages whose job cards did not change since the last fetch reuse the cached job keys instead of being parsed again
+    use_page_cache: bool = True
+    page_cache_ttl_minutes: int = 60
+    # Descriptions of new jobs are added to the report, fetched concurrently and cached by job key
+    fetch_descriptions: bool = True
+    description_concurrency: int = 5
+    description_cache_ttl_days: int = 30
+    # Searches with more results than max_results are split into sub-searches (shards) with extra filters,
+    # see split_shard. extra_parameters holds the filters of a shard and is added to every URL of the search.
+    # max_shards counts every shard of a search, the unfiltered one included.
+    shard_large_searches: bool = True
+    max_shards: int = 16
+    # New jobs whose content matches a job already reported by any search are not reported again, see find_reposts
+    detect_reposts: bool = True
+    repost_max_distance: int = 3
+    extra_parameters: Dict[str, str] = field(default_factory=dict)
+    # Every card is upserted into the job store. The raw cards of each run are only dumped to
+    # _final_results.ndjson when save_raw_results is set.
+    job_store_path: str = "scrapped_data/jobs.sqlite3"
+    save_raw_results: bool = False
+    # Fetched pages waiting to be parsed. When parsing falls behind, fetching waits for room in the queue.
+    parse_queue_size: int = 10
+    # Failed requests are retried with exponential backoff. Pages of a full sweep are checkpointed to Redis,
+    # so when a run crashes part way the next run within checkpoint_ttl_minutes of its start only fetches the rest.
+    page_retries: int = 3
+    retry_base_delay_seconds: float = 2.0
+    checkpoint_pages: bool = True
+    checkpoint_ttl_minutes: int = 60
 
-load_dotenv()
-api_key = os.getenv('API_KEY')
-scrapfly = ScrapflyClient(key=api_key)
+@dataclass
+class ScrapeRunStats:
+    pages: int = 0
+    unchanged_pages: int = 0
+    # (url, content hash, job keys) of parsed pages, written to the page cache once the run's keys are marked as seen
+    page_cache_updates: List[Tuple[str, str, List[str]]] = field(default_factory=list)
+    # URLs of the pages that still failed after their retries. The run only partially covers the search.
+    failed_pages: List[str] = field(default_factory=list)
+    # (job keys, job records) of the pages finished by an interrupted run, keyed by URL, see get_checkpoint
+    checkpoint: Dict[str, Tuple[List[str], List[JobRecord]]] = field(default_factory=dict)
+    resumed_pages: int = 0
+    # Shards started by the search, bounded by max_shards, see split_shard
+    shards: int = 0
+
+# (seen-jobs index, location) already checked for the job keys of the JSON history, see migrate_old_job_keys
+migrated_seen_jobs_keys: Set[Tuple[str, str]] = set()
+
+# Created on first use by get_scrapfly, so importing the scraper neither reads .env nor builds a client
+scrapfly: Optional[ScrapflyClient] = None
+
+def get_scrapfly() -> ScrapflyClient:
+    global scrapfly
+    if scrapfly is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        api_key = os.getenv('API_KEY')
+        scrapfly = ScrapflyClient(key=api_key)
+    return scrapfly
+
+# Default number of pages in flight when the account concurrency cannot be read
+DEFAULT_PAGE_CONCURRENCY = 5
+# Every Scrapfly request of every search goes through fetch_page and shares this limit,
+# so concurrent searches never exceed the account's concurrency. See configure_page_concurrency.
+page_semaphore = asyncio.Semaphore(DEFAULT_PAGE_CONCURRENCY)
+# When Scrapfly answers 429, every request waits until this time, not only the page that got it
+throttled_until = 0.0
+RETRY_MAX_DELAY_SECONDS = 60
+
+# Decoding the job cards of a page is CPU bound, but with extract_mosaic_jobcards it takes well under a
+# millisecond, less than sending the page to another process. Pages are parsed on the event loop unless
+# configure_parse_workers sets up a pool of processes, shared by every search and created on first use.
+parse_executor: Optional[ProcessPoolExecutor] = None
+parse_workers = 0
+
+# Filters used to split a search that has more results than Indeed shows. Job types don't overlap, and
+# experience levels split each job type further when needed. Jobs without a job type or level are still
+# covered by the unfiltered search, which always runs as well.
+SHARD_FILTERS = (
+    ("jt", ("fulltime", "parttime", "contract", "temporary", "internship")),
+    ("sc", ("0kf:explvl(ENTRY_LEVEL);", "0kf:explvl(MID_LEVEL);", "0kf:explvl(SENIOR_LEVEL);")),
+)
+
+# Returned by scrap_description_link when the description could not be scraped
+DESCRIPTION_NOT_AVAILABLE = "Job description not available."
+DESCRIPTION_ERROR = "Error retrieving job description."
+
+# Assignment that holds the search results in the page, see parse_search_page
+MOSAIC_JOBCARDS_MARKER = 'window.mosaic.providerData["mosaic-provider-jobcards"]='
+json_decoder = json.JSONDecoder()
 
 logger = app_logger.getChild('scraper')
 logging.basicConfig(level=logging.INFO)
 
-async def scrape_search(query: str, location: str, radius: int, max_results: int = 1000) -> bool:
-    config = ScrappingJobConfig(query, location, radius, max_results)
+async def scrape_search(query: str, location: str, radius: int, max_results: int = 1000,
+                        incremental: bool = False) -> Optional[Dict[str, Dict]]:
+    # Returns the report of every new job keyed by job key (empty if there are no new jobs), or None if the scrape failed
+    config = ScrappingJobConfig(query, location, radius, max_results, incremental=incremental)
+    if scrape_archive.is_replaying:
+        # Reports and the job store of a replay are written next to the archive, never over the live ones.
+        # Redis state goes to its own database as well, see get_redis_db.
+        replay_directory = os.path.join(scrape_archive.directory, "replay")
+        config = replace(config, directory=replay_directory, job_store_path=os.path.join(replay_directory, "jobs.sqlite3"))
     job_keys = set()
     results = {}
+    stats = ScrapeRunStats()
+    # Labels the metrics of everything this search does, including the tasks it starts
+    current_search.set(f"{query}_{location}")
 
     try:
         os.makedirs(config.directory, exist_ok=True)
 
         logger.info(f"Scraping first page of search: query={query}, location={location}")
-        data_first_page = await scrape_first_page(config)
-        add_job_keys(data_first_page, job_keys, results)
+        with observe_stage("first_page"):
+            data_first_page = await scrape_first_page(config)
+        add_job_keys(data_first_page, job_keys, results, config.save_raw_results)
 
         total_results = calculate_total_results(data_first_page, config.max_results)
         logger.info(f"Total results: {total_results}")
@@ -49,42 +167,487 @@ async def scrape_search(query: str, location: str, radius: int, max_results: int
         number_of_pages = calculate_number_of_pages(total_results)
         logger.info(f"Total number of pages: {number_of_pages}. Scrapping now...")
         
+        full_sweep = not config.incremental or await should_full_sweep(query, location, config.full_sweep_every_minutes * 60)
+        if full_sweep and config.checkpoint_pages:
+            stats.checkpoint = {
+                url: (page_keys, [JobRecord.from_card(card, config.save_raw_results) for card in cards])
+                for url, (page_keys, cards) in (await get_checkpoint(get_checkpoint_key(query, location), config.checkpoint_ttl_minutes * 60)).items()
+            }
+            if stats.checkpoint:
+                logger.info(f"Resuming an interrupted run, {len(stats.checkpoint)} pages are already done")
+
         # For the highest precision, especially useful in measuring very short durations and benchmarking, use time.perf_counter()
         start_time = time.perf_counter()
-        await scrape_remaining_pages(config, total_results, job_keys, results)
-        save_results(results, config)    
+        with observe_stage("remaining_pages"):
+            if full_sweep and config.shard_large_searches and count_total_results(data_first_page) > config.max_results:
+                await scrape_shards(config, count_total_results(data_first_page), job_keys, results, stats)
+            elif full_sweep:
+                await scrape_remaining_pages(config, total_results, job_keys, results, stats)
+            else:
+                first_page_keys = [result["jobkey"] for result in data_first_page["results"]]
+                first_page_known = await is_page_known(first_page_keys, config)
+                pages_scraped = await scrape_incremental_pages(config, total_results, job_keys, results, stats, first_page_known)
+                logger.info(f"Incremental scrape stopped after {pages_scraped} of {number_of_pages} pages")
+        logger.info(f"Unchanged pages: {stats.unchanged_pages} of {stats.pages}, resumed from checkpoint: {stats.resumed_pages}")
+        if stats.failed_pages:
+            logger.warning(f"{len(stats.failed_pages)} pages failed, continuing with the jobs of the other pages")
+        with observe_stage("save_results"):
+            # SQLite is synchronous, so the upsert runs in a worker thread to keep the event loop free
+            await asyncio.to_thread(get_job_store(config.job_store_path).save_jobs, query, location,
+                                    [job.to_store() for job in results.values()], list(job_keys - results.keys()))
+            if config.save_raw_results:
+                save_results(results, config)
         end_time = time.perf_counter()
         duration = end_time - start_time
         logger.info(f"Complete parsing took: {duration} seconds")
         
-        new_keys = check_for_new_jobs(job_keys, config)
+        with observe_stage("dedupe"):
+            new_keys = await check_for_new_jobs(job_keys, results, config)
         logger.info(f"New Jobs: {len(new_keys)}")
-
-        await create_report(new_keys, config)
-
-        new_jobs_found = len(new_keys) > 0
-        return new_jobs_found
+        new_jobs_total.inc(len(new_keys), search=current_search.get())
+        # From here on the new jobs are marked as seen, so they would never be reported again if the run
+        # failed. Everything that follows is best effort and only logs its errors, except building the report.
+        try:
+            # Only cache pages once their keys are marked as seen, so a cached page never hides a new job
+            await set_cached_pages(stats.page_cache_updates, config.page_cache_ttl_minutes * 60)
+        except Exception as e:
+            logger.error(f"Could not cache the pages of the run: {e}")
+
+        with observe_stage("report"):
+            new_job_reports = await create_report(new_keys, results, config)
+
+        with observe_stage("index"):
+            try:
+                alerts = await index_new_jobs(new_job_reports, config)
+            except Exception as e:
+                # e.g. the job store being locked by another writer, the jobs are indexed when they change again
+                logger.error(f"Could not index the new jobs or match keyword alerts: {e}")
+                alerts = {}
+        for alert, alert_job_keys in alerts.items():
+            logger.info(f"Keyword alert '{alert}' matched {len(alert_job_keys)} new jobs: {', '.join(alert_job_keys)}")
+            # Shown with the report and in the new jobs alert
+            for job_key in alert_job_keys:
+                new_job_reports[job_key].setdefault("keywordAlerts", []).append(alert)
+        write_report(new_job_reports, config)
+
+        try:
+            # The checkpoint is only for crashed runs. After a partial run the pages it did get would be stale by
+            # the next run, which fetches every page again since a partial run does not count as a full sweep.
+            if full_sweep and config.checkpoint_pages:
+                await delete_checkpoint(get_checkpoint_key(query, location))
+            if config.incremental and full_sweep and not stats.failed_pages:
+                await set_last_full_sweep(query, location)
+        except Exception as e:
+            logger.error(f"Could not save the sweep state of the run: {e}")
+
+        searches_total.inc(search=current_search.get(), outcome="partial" if stats.failed_pages else "success")
+        return new_job_reports
     
     except Exception as e:
+        searches_total.inc(search=current_search.get(), outcome="failed")
         logger.error(f"An error occurred during scraping: {e}")
 
 async def scrape_first_page(config: ScrappingJobConfig) -> Dict:
     url = make_request_url(config.query, config.location, from_param="searchOnDesktopSerp")
-    result = await scrapfly.async_scrape(ScrapeConfig(url, asp=True))
-    return parse_search_page(result.content)
-
-async def scrape_remaining_pages(config: ScrappingJobConfig, total_results: int, job_keys: Set[str], results: Dict):
+    result = await fetch_page_with_retry(url, config, make_session_name(config, 0))
+    return await parse_search_page_in_pool(result.content, config.save_raw_results)
+
+async def scrape_remaining_pages(config: ScrappingJobConfig, total_results: int, job_keys: Set[str], results: Dict,
+                                 stats: ScrapeRunStats):
+    # Fetching and parsing overlap: fetchers put pages on a bounded queue and parsers take them off it to
+    # parse them in the process pool. A full queue stops the fetchers, so pages never pile up in memory
+    # when parsing falls behind. Parsed pages are merged in offset order, whatever order they arrive in.
+    other_pages = generate_other_pages(config, total_results)
+    if not other_pages:
+        return
+
+    parsed_pages = {}
+    next_page = 0
+    # Pages finished by an interrupted run of the search come from the checkpoint instead of being fetched again
+    pages_to_fetch = []
+    for index, url in enumerate(other_pages):
+        if url in stats.checkpoint:
+            parsed_pages[index] = stats.checkpoint[url]
+            stats.resumed_pages += 1
+        else:
+            pages_to_fetch.append((index, url))
+
+    def merge_parsed_pages():
+        nonlocal next_page
+        while next_page in parsed_pages:
+            merge_page(*parsed_pages.pop(next_page), job_keys, results)
+            next_page += 1
+
+    queue = asyncio.Queue(maxsize=config.parse_queue_size)
+    pending_pages = iter(pages_to_fetch)
+    fetchers = min(config.parse_queue_size, len(pages_to_fetch))
+    # Without worker processes a single parser is enough, it parses on the event loop
+    parsers = min(max(parse_workers, 1), len(pages_to_fetch))
+    running_fetchers = fetchers
+
+    async def fetch_pages(slot):
+        nonlocal running_fetchers
+        # The fetchers share one iterator, so each page is fetched once. fetch_page keeps the number
+        # of pages in flight within the shared concurrency budget. Each fetcher reuses its own Scrapfly
+        # session, a session can't serve concurrent requests.
+        session = make_session_name(config, slot)
+        for index, url in pending_pages:
+            try:
+                result = await fetch_page_with_retry(url, config, session)
+            except Exception as e:
+                # A failed page is skipped, the rest of the run goes on
+                record_failed_page(url, e, stats)
+                await queue.put((index, url, None))
+                continue
+            await queue.put((index, url, result.content))
+        running_fetchers -= 1
+        if running_fetchers == 0:
+            for _ in range(parsers):
+                await queue.put(None)
+
+    async def parse_pages():
+        while (item := await queue.get()) is not None:
+            index, url, html = item
+            parsed_page = ([], [])
+            if html is not None:
+                try:
+                    parsed_page = await parse_page(url, html, config, stats)
+                    await checkpoint_page(url, parsed_page, config)
+                except Exception as e:
+                    record_failed_page(url, e, stats)
+            parsed_pages[index] = parsed_page
+            merge_parsed_pages()
+
+    tasks = [asyncio.create_task(fetch_pages(slot)) for slot in range(fetchers)] + \
+            [asyncio.create_task(parse_pages()) for _ in range(parsers)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # If the search is cancelled, the other fetchers and parsers must not keep running
+        for task in tasks:
+            task.cancel()
+    merge_parsed_pages()
+
+async def checkpoint_page(url: str, parsed_page: Tuple[List[str], List[JobRecord]], config: ScrappingJobConfig):
+    if not config.checkpoint_pages:
+        return
+    page_keys, page_jobs = parsed_page
+    try:
+        await save_checkpoint_page(get_checkpoint_key(config.query, config.location), url, page_keys,
+                                   [job.to_store() for job in page_jobs], config.checkpoint_ttl_minutes * 60)
+    except Exception as e:
+        # The page itself is fine, only resuming would have to fetch it again
+        logger.warning(f"Could not checkpoint page {url}: {e}")
+
+def record_failed_page(url: str, error: Exception, stats: ScrapeRunStats):
+    stats.failed_pages.append(url)
+    failed_pages_total.inc(search=current_search.get())
+    logger.error(f"Page {url} failed: {error}")
+
+async def scrape_shards(config: ScrappingJobConfig, total_results: int, job_keys: Set[str], results: Dict,
+                        stats: ScrapeRunStats):
+    # The unfiltered search was already started with the first page, the other shards run next to it.
+    # All of them add to the same job_keys and results, so a job found by several shards is kept once.
+    stats.shards = 1
+    await scrape_split_shards(config, total_results, job_keys, results, stats)
+    logger.info(f"{stats.shards} shards found {len(job_keys)} unique jobs out of {total_results}")
+
+async def scrape_split_shards(config: ScrappingJobConfig, total_results: int, job_keys: Set[str], results: Dict,
+                              stats: ScrapeRunStats):
+    # Scrapes a search (or shard) that is over max_results: its first max_results results, plus one more
+    # filtered shard per value of the next filter. Jobs without that filter's attribute are only found by
+    # the search itself.
+    shards = split_shard(config, stats)
+    if shards:
+        logger.info(f"{total_results} results of {config.extra_parameters or 'the search'} are over the limit of "
+                    f"{config.max_results}, splitting into {len(shards)} shards")
+    else:
+        logger.warning(f"{total_results} results of {config.extra_parameters or 'the search'} are over the limit of "
+                       f"{config.max_results} and can't be split further, {total_results - config.max_results} are not covered")
+
+    await asyncio.gather(
+        scrape_remaining_pages(config, config.max_results, job_keys, results, stats),
+        *(scrape_shard(replace(config, extra_parameters=shard), job_keys, results, stats) for shard in shards)
+    )
+
+async def scrape_shard(config: ScrappingJobConfig, job_keys: Set[str], results: Dict, stats: ScrapeRunStats):
+    url = make_request_url(config.query, config.location, config.radius, extra_parameters=config.extra_parameters)
+    try:
+        result = await fetch_page_with_retry(url, config, make_session_name(config, 0))
+        data_first_page = await parse_search_page_in_pool(result.content, config.save_raw_results)
+    except Exception as e:
+        # Without its first page the size of the shard is unknown, the other shards still run
+        record_failed_page(url, e, stats)
+        return
+    add_job_keys(data_first_page, job_keys, results, config.save_raw_results)
+
+    # A shard still over the limit, e.g. full time jobs of a large search, is split by the next filter
+    shard_results = count_total_results(data_first_page)
+    if shard_results > config.max_results:
+        await scrape_split_shards(config, shard_results, job_keys, results, stats)
+        return
+    total_results = calculate_total_results(data_first_page, config.max_results)
+    await scrape_remaining_pages(config, total_results, job_keys, results, stats)
+
+def split_shard(config: ScrappingJobConfig, stats: ScrapeRunStats) -> List[Dict[str, str]]:
+    # Returns the extra parameters of the shards splitting config by the first filter of SHARD_FILTERS it
+    # doesn't use yet, one shard per value. Only shards that are actually over the limit are split, so
+    # max_shards goes to the largest ones. Returns no shards when the split would go over max_shards.
+    for name, values in SHARD_FILTERS:
+        if name in config.extra_parameters:
+            continue
+        if stats.shards + len(values) > config.max_shards:
+            return []
+        stats.shards += len(values)
+        return [{**config.extra_parameters, name: value} for value in values]
+    return []
+
+async def scrape_page(url: str, config: ScrappingJobConfig, job_keys: Set[str], results: Dict, stats: ScrapeRunStats,
+                      session: Optional[str] = None) -> Optional[List[str]]:
+    # Returns None if the page failed
+    try:
+        result = await fetch_page_with_retry(url, config, session)
+        return await process_page(url, result.content, config, job_keys, results, stats)
+    except Exception as e:
+        record_failed_page(url, e, stats)
+        return None
+
+async def process_page(url: str, html: str, config: ScrappingJobConfig, job_keys: Set[str], results: Dict,
+                       stats: ScrapeRunStats) -> List[str]:
+    # Returns the job keys found on the page
+    page_keys, page_jobs = await parse_page(url, html, config, stats)
+    merge_page(page_keys, page_jobs, job_keys, results)
+    return page_keys
+
+async def parse_page(url: str, html: str, config: ScrappingJobConfig,
+                     stats: ScrapeRunStats) -> Tuple[List[str], List[JobRecord]]:
+    # Returns the job keys and the job records of the page. The records are empty when the page is unchanged.
+    # Cards are compacted right away, so pages waiting to be merged don't hold Indeed's whole payload.
+    stats.pages += 1
+    if config.use_page_cache:
+        content_hash = hash_jobcards(html)
+        cached_page = await get_cached_page(url)
+        if cached_page is not None and cached_page[0] == content_hash:
+            # Same cards as the last fetch: all of them were already seen, so only the keys are needed
+            stats.unchanged_pages += 1
+            unchanged_pages_total.inc(search=current_search.get())
+            return cached_page[1], []
+
+    parsed_results = await parse_search_page_in_pool(html, config.save_raw_results)
+    page_keys = [result["jobkey"] for result in parsed_results["results"]]
+
+    if config.use_page_cache:
+        stats.page_cache_updates.append((url, content_hash, page_keys))
+    return page_keys, [JobRecord.from_card(card, config.save_raw_results) for card in parsed_results["results"]]
+
+def merge_page(page_keys: List[str], page_jobs: List[JobRecord], job_keys: Set[str], results: Dict):
+    for job in page_jobs:
+        if job.jobkey not in job_keys:
+            job_keys.add(job.jobkey)
+            results[job.jobkey] = job
+    job_keys.update(page_keys)
+
+def hash_jobcards(html: str) -> str:
+    # Only the script holding the job cards is hashed, the rest of the page changes on every request
+    start = html.find(MOSAIC_JOBCARDS_MARKER)
+    end = html.find("</script>", start) if start != -1 else -1
+    jobcards = html[max(start, 0):end if end != -1 else len(html)]
+    return hashlib.sha1(jobcards.encode("utf-8")).hexdigest()
+
+def configure_parse_workers(workers: Optional[int] = None) -> int:
+    # Must be called before any search starts. None or 0 parses on the event loop.
+    global parse_workers
+    shutdown_parse_workers()
+    parse_workers = workers or 0
+    logger.info(f"Search pages parsed by {parse_workers or 'no'} worker processes")
+    return parse_workers
+
+def shutdown_parse_workers():
+    global parse_executor
+    if parse_executor is not None:
+        parse_executor.shutdown(cancel_futures=True)
+        parse_executor = None
+
+async def configure_page_concurrency(max_concurrent_pages: Optional[int] = None) -> int:
+    # Must be awaited before any search starts. When no limit is given, the account's concurrency
+    # is read from Scrapfly so all searches together use exactly what the subscription allows.
+    global page_semaphore
+    if max_concurrent_pages is None:
+        try:
+            # The SDK call is blocking, it runs in a thread so the event loop (metrics server, GUI queue) keeps going
+            account = await asyncio.to_thread(get_scrapfly().account)
+            max_concurrent_pages = account["subscription"]["max_concurrency"]
+        except Exception as e:
+            logger.warning(f"Could not read the Scrapfly account concurrency, using {DEFAULT_PAGE_CONCURRENCY}: {e}")
+            max_concurrent_pages = DEFAULT_PAGE_CONCURRENCY
+    page_semaphore = asyncio.Semaphore(max_concurrent_pages)
+    logger.info(f"Scrapfly page concurrency set to {max_concurrent_pages}")
+    return max_concurrent_pages
+
+async def fetch_page_with_retry(url: str, config: ScrappingJobConfig, session: Optional[str] = None):
+    # Retries fetch_with_profiles with exponential backoff and jitter. A 429 throttles every request, see throttle_requests.
+    for attempt in range(config.page_retries + 1):
+        try:
+            return await fetch_with_profiles(url, session)
+        except Exception as e:
+            if attempt == config.page_retries or not is_retryable(e):
+                raise
+            delay = min(config.retry_base_delay_seconds * 2 ** attempt, RETRY_MAX_DELAY_SECONDS) * random.uniform(0.5, 1)
+            if get_status_code(e) == 429:
+                delay = max(delay, getattr(e, "retry_delay", None) or 0)
+                throttle_requests(delay)
+            page_retries_total.inc(search=current_search.get())
+            logger.warning(f"Request to {url} failed (attempt {attempt + 1}), retrying in {delay:.1f}s: {e}")
+            await asyncio.sleep(delay)
+
+async def fetch_with_profiles(url: str, session: Optional[str] = None):
+    # Starts with the cheapest request profile known to work for this kind of URL and moves to the next
+    # one when the response looks blocked, see request_profiles. The last profile's response is always returned.
+    if scrape_archive.is_replaying:
+        return await fetch_page(ScrapeConfig(url))
+
+    pattern = get_url_pattern(url)
+    start_level = await request_profiles.get_start_level(pattern)
+    for level in range(start_level, len(REQUEST_PROFILES)):
+        profile = REQUEST_PROFILES[level]
+        is_last_profile = level == len(REQUEST_PROFILES) - 1
+        parameters = dict(profile.parameters)
+        if session is not None:
+            # A session keeps its proxy, so each profile gets its own
+            parameters["session"] = f"{session}-{profile.name}"
+
+        result = None
+        start_time = time.perf_counter()
+        try:
+            result = await fetch_page(ScrapeConfig(url, **parameters))
+            blocked = not is_last_profile and is_blocked_page(url, result.content)
+        except Exception as e:
+            if is_last_profile or not is_blocked_error(e):
+                raise
+            blocked = True
+        profile_fetch_seconds.observe(time.perf_counter() - start_time, pattern=pattern, profile=profile.name)
+        if result is not None:
+            profile_credits_total.inc(get_response_cost(result), pattern=pattern, profile=profile.name)
+
+        if blocked:
+            profile_requests_total.inc(pattern=pattern, profile=profile.name, outcome="blocked")
+            logger.info(f"Request to {url} was blocked with the {profile.name} profile")
+            await request_profiles.record_block(pattern, level)
+            continue
+        profile_requests_total.inc(pattern=pattern, profile=profile.name, outcome="success")
+        await request_profiles.record_success(pattern, level)
+        return result
+
+def is_blocked_error(error: Exception) -> bool:
+    # Indeed refusing the request, or Scrapfly reporting an anti-bot protection it could not get through
+    return get_status_code(error) in (401, 403) or "ASP" in str(getattr(error, "code", ""))
+
+def is_blocked_page(url: str, content: str) -> bool:
+    # A challenge page comes back with a 200 status, it is recognized by what it lacks. Everything that
+    # isn't a search page is a job link (/rc/clk, /pagead/clk for sponsored jobs, /viewjob, ...), which
+    # redirects to the job description.
+    if "/jobs?" in url:
+        return MOSAIC_JOBCARDS_MARKER not in content
+    return "jobDescriptionText" not in content
+
+def make_session_name(config: ScrappingJobConfig, slot: int) -> str:
+    # One Scrapfly session per concurrent fetcher of a search (and shard), reused across its pages
+    search = json.dumps([config.query, config.location, config.extra_parameters], sort_keys=True)
+    return f"{hashlib.sha1(search.encode('utf-8')).hexdigest()[:16]}-{slot}"
+
+def get_status_code(error: Exception) -> Optional[int]:
+    # Scrapfly errors carry the status of the API response, HTTP errors the status of their response
+    status_code = getattr(error, "http_status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, KeyError):
+        # A page missing from the replay archive will still be missing
+        return False
+    # Scrapfly tells whether an error is worth retrying, e.g. not for an exhausted quota
+    if getattr(error, "is_retryable", None) is not None and get_status_code(error) != 429:
+        return error.is_retryable
+    status_code = get_status_code(error)
+    return status_code is None or status_code in (408, 429) or status_code >= 500
+
+def throttle_requests(delay: float):
+    global throttled_until
+    throttled_until = max(throttled_until, time.time() + delay)
+    logger.warning(f"Scrapfly is rate limiting, pausing all requests for {delay:.1f}s")
+
+async def fetch_page(scrape_config: ScrapeConfig):
+    # Replayed pages come straight from disk and don't count against the Scrapfly concurrency
+    if scrape_archive.is_replaying:
+        return scrape_archive.replay(scrape_config.url)
+
+    search = current_search.get()
+    while throttled_until > time.time():
+        await asyncio.sleep(throttled_until - time.time())
+    async with page_semaphore:
+        with page_fetch_seconds.time(search=search):
+            result = await get_scrapfly().async_scrape(scrape_config)
+
+    pages_total.inc(search=search)
+    bytes_total.inc(len(result.content), search=search)
+    credits_total.inc(get_response_cost(result), search=search)
+
+    if scrape_archive.is_recording:
+        scrape_archive.record(scrape_config.url, result.content)
+    return result
+
+def get_response_cost(result) -> int:
+    # Scrapfly reports the credits spent on a request in the X-Scrapfly-Api-Cost header
+    response = getattr(result, "response", None)
+    if response is None:
+        return 0
+    return int(response.headers.get("X-Scrapfly-Api-Cost", 0))
+
+async def scrape_incremental_pages(config: ScrappingJobConfig, total_results: int, job_keys: Set[str], results: Dict,
+                                   stats: ScrapeRunStats, first_page_known: bool) -> int:
+    # Pages are sorted by date, so once a few consecutive pages only hold known keys the rest of the
+    # search is older than the last run and there is no need to pay for it.
+    # Pages are fetched in small batches to keep some concurrency; asyncio.gather keeps them in offset order.
     other_pages = generate_other_pages(config, total_results)
-    # The concurrent_scrape() method in the Scrapfly Python SDK automatically manages concurrency up to the Scrapfly
-    # account's concurrency limit.
-    async for result in scrapfly.concurrent_scrape(other_pages):
-        parsed_results = parse_search_page(result.content)
-        add_job_keys(parsed_results, job_keys, results)
+    consecutive_known_pages = 1 if first_page_known else 0
+    # The first page was already scraped
+    pages_scraped = 1
+
+    for batch_start in range(0, len(other_pages), config.incremental_batch_pages):
+        batch = other_pages[batch_start:batch_start + config.incremental_batch_pages]
+        batch_page_keys = await asyncio.gather(*(
+            scrape_page(url, config, job_keys, results, stats, make_session_name(config, slot)) for slot, url in enumerate(batch)
+        ))
+
+        for page_keys in batch_page_keys:
+            pages_scraped += 1
+
+            if page_keys is None:
+                # A failed page might hold new jobs, so it never counts as known
+                consecutive_known_pages = 0
+            elif await is_page_known(page_keys, config):
+                consecutive_known_pages += 1
+            else:
+                consecutive_known_pages = 0
+
+            if consecutive_known_pages >= config.known_pages_to_stop:
+                return pages_scraped
+
+    return pages_scraped
+
+async def is_page_known(page_keys: List[str], config: ScrappingJobConfig) -> bool:
+    seen_keys = await find_seen_job_keys(get_seen_jobs_key(config.query, config.location, config.global_seen_jobs), page_keys)
+    return len(seen_keys) == len(set(page_keys))
 
 def calculate_total_results(data: Dict, max_results: int) -> int:
-    total_results = sum(category["jobCount"] for category in data["meta"])
+    total_results = count_total_results(data)
     return min(total_results, max_results)
 
+def count_total_results(data: Dict) -> int:
+    # Number of jobs matching the search, including the ones past Indeed's page limit
+    return sum(category["jobCount"] for category in data["meta"])
+
 def calculate_number_of_pages(total_results: int) -> int:
     # Adding 9 is a mathematical trick used to ensure that when you divide by 10, 
     # you effectively perform a ceiling division without needing to import additional functions or libraries. 
@@ -93,23 +656,25 @@ def calculate_number_of_pages(total_results: int) -> int:
     number_of_pages = (total_results + 9) // 10
     return number_of_pages
 
-def generate_other_pages(config: ScrappingJobConfig, total_results: int) -> List[ScrapeConfig]:
+def generate_other_pages(config: ScrappingJobConfig, total_results: int) -> List[str]:
     # for offset in range(10, min(total_results, max_results), 10):
     #     url = make_page_url(query, location, radius, offset)
-    #     config = ScrapeConfig(url, asp=True)
-    #     other_pages.append(config)
-    # The list comprehension below is equivalent to the code above
+    #     other_pages.append(url)
+    # The list comprehension below is equivalent to the code above. The Scrapfly settings of each
+    # request are chosen when it is fetched, see fetch_with_profiles.
     return [
-        ScrapeConfig(make_request_url(config.query, config.location, config.radius, offset=offset), asp=True)
+        make_request_url(config.query, config.location, config.radius, offset=offset, extra_parameters=config.extra_parameters)
         for offset in range(10, min(total_results, config.max_results), 10)
     ]
 
 def save_results(results: Dict, config: ScrappingJobConfig):
-    filename = f"{config.directory}/{config.query}_{config.location}_final_results.json"
+    # One job card per line (NDJSON), written card by card instead of serializing the whole dict at once
+    filename = f"{config.directory}/{config.query}_{config.location}_final_results.ndjson"
     with open(filename, "w") as file:
-        json.dump(results, file)
+        for job in results.values():
+            file.write(json.dumps(job.to_store()) + "\n")
 
-def make_request_url(query, location, radius=None, from_param=None, offset=None):
+def make_request_url(query, location, radius=None, from_param=None, offset=None, extra_parameters=None):
     # The first request to the Indeed search page only requires the query, location, and from parameter
 
     # sort=date appears in the url when the search is sorted by date. Testing with this parameter
@@ -124,6 +689,9 @@ def make_request_url(query, location, radius=None, from_param=None, offset=None)
         parameters["radius"] = radius
     if offset is not None:
         parameters["start"] = offset
+    # Filters of a shard, see split_shard
+    if extra_parameters:
+        parameters.update(extra_parameters)
     
     url = "https://www.indeed.com/jobs?" + urlencode(parameters)
     
@@ -131,16 +699,87 @@ def make_request_url(query, location, radius=None, from_param=None, offset=None)
     return url
 
 # def add_job_keys(parsed_results, job_keys, results):
-def add_job_keys(parsed_results: Dict, job_keys: Set[str], results: Dict):
+def add_job_keys(parsed_results: Dict, job_keys: Set[str], results: Dict, keep_raw: bool = False):
+    # results holds a compact JobRecord per job key, the raw card is only kept with keep_raw
     for result in parsed_results["results"]:
         job_key = result["jobkey"]
         if job_key not in job_keys:
             job_keys.add(job_key)
-            results[job_key] = result
+            results[job_key] = JobRecord.from_card(result, keep_raw)
 
 def parse_search_page(html: str):
+    with parse_seconds.time(search=current_search.get()):
+        return parse_jobcards(html)
+
+async def parse_search_page_in_pool(html: str, keep_raw: bool = True):
+    # Same as parse_search_page, run in the parse process pool when there is one. Only the job cards JSON is
+    # sent to the worker, and unless keep_raw the cards come back compacted, see compact_card.
+    global parse_executor
+    if parse_workers == 0:
+        return parse_search_page(html)
+    if parse_executor is None:
+        # Spawned rather than forked: the GUI and to_thread threads are already running by now
+        parse_executor = ProcessPoolExecutor(parse_workers, mp_context=multiprocessing.get_context("spawn"))
+    loop = asyncio.get_running_loop()
+    with parse_seconds.time(search=current_search.get()):
+        jobcards = slice_mosaic_jobcards(html)
+        parsed_results = None
+        if jobcards is not None:
+            parsed_results = await loop.run_in_executor(parse_executor, decode_jobcards, jobcards, keep_raw)
+        if parsed_results is None:
+            # Rare, only then does the whole page go to the worker
+            parsed_results = await loop.run_in_executor(parse_executor, parse_search_page_regex, html)
+        return parsed_results
+
+def parse_jobcards(html: str):
     # This type of data is commonly known as hidden web data. 
     # It is the same data present on the web page but before it gets rendered in HTML.
+    # Runs in the parse worker processes, so it must not depend on the state of the event loop.
+    data = extract_mosaic_jobcards(html)
+    if data is None:
+        return parse_search_page_regex(html)
+    return {
+        "results": data["metaData"]["mosaicProviderJobCardsModel"]["results"],
+        "meta": data["metaData"]["mosaicProviderJobCardsModel"]["tierSummaries"],
+    }
+
+def extract_mosaic_jobcards(html: str):
+    # Instead of running a regex over the whole page, find the assignment with str.find and let raw_decode
+    # parse a single JSON object starting right after it. Decoding stops at the end of that object,
+    # so the rest of the page is never scanned.
+    start = html.find(MOSAIC_JOBCARDS_MARKER)
+    if start == -1:
+        return None
+    try:
+        data, _ = json_decoder.raw_decode(html, start + len(MOSAIC_JOBCARDS_MARKER))
+    except json.JSONDecodeError as e:
+        logger.warning(f"Could not decode the mosaic jobcards data, falling back to the regex: {e}")
+        return None
+    return data
+
+def slice_mosaic_jobcards(html: str) -> Optional[str]:
+    # The text from the start of the job cards JSON to the end of its script, see decode_jobcards
+    start = html.find(MOSAIC_JOBCARDS_MARKER)
+    if start == -1:
+        return None
+    end = html.find("</script>", start)
+    return html[start + len(MOSAIC_JOBCARDS_MARKER):end if end != -1 else len(html)]
+
+def decode_jobcards(jobcards: str, keep_raw: bool = True) -> Optional[Dict]:
+    # Runs in the parse worker processes. Returns None if the JSON can't be decoded.
+    try:
+        data, _ = json_decoder.raw_decode(jobcards)
+    except json.JSONDecodeError as e:
+        logger.warning(f"Could not decode the mosaic jobcards data, falling back to the regex: {e}")
+        return None
+    results = data["metaData"]["mosaicProviderJobCardsModel"]["results"]
+    return {
+        # Compacted here, so the bulky fields of the cards are never sent back to the event loop process
+        "results": results if keep_raw else [compact_card(card) for card in results],
+        "meta": data["metaData"]["mosaicProviderJobCardsModel"]["tierSummaries"],
+    }
+
+def parse_search_page_regex(html: str):
     data = re.findall(r'window.mosaic.providerData\["mosaic-provider-jobcards"\]=(\{.+?\});', html)
     if not data:
         print("No data found with the regex pattern.")
@@ -151,101 +790,122 @@ def parse_search_page(html: str):
         "meta": data["metaData"]["mosaicProviderJobCardsModel"]["tierSummaries"],
     }
 
-def check_for_new_jobs(job_keys: Set[str], config: ScrappingJobConfig) -> Set[str]:
-    old_jobkeys_filename = f"{config.directory}/{config.location}_jobkeys_old.json"
+async def check_for_new_jobs(job_keys: Set[str], results: Dict, config: ScrappingJobConfig) -> Set[str]:
     new_jobkeys_filename = f"{config.directory}/{config.query}_{config.location}_new_keys.json"
-    
-    new_job_keys = set()
-    old_job_keys = set()
-
-    if os.path.exists(old_jobkeys_filename):
-        with open(old_jobkeys_filename, "r") as file:
-            old_job_keys = set(json.load(file))
+    seen_jobs_key = get_seen_jobs_key(config.query, config.location, config.global_seen_jobs)
 
-    new_job_keys = job_keys - old_job_keys
-    old_job_keys.update(new_job_keys)
+    await migrate_old_job_keys(config, seen_jobs_key)
+    # Only the keys of this run are checked against Redis, so the cost does not grow with the history
+    new_job_keys = job_keys - await find_seen_job_keys(seen_jobs_key, list(job_keys))
+    await mark_jobs_as_seen(seen_jobs_key, list(job_keys), config.seen_jobs_max_age_days)
 
-    with open(old_jobkeys_filename, "w") as file:
-        json.dump(list(old_job_keys), file)
+    if config.detect_reposts:
+        # Reposts get a new job key, and overlapping searches find the same job. Both are caught by content.
+        new_jobs = {job_key: results[job_key].to_store() for job_key in new_job_keys if job_key in results}
+        new_job_keys = new_job_keys - await find_reposts(new_jobs, config.repost_max_distance, config.seen_jobs_max_age_days)
 
     with open(new_jobkeys_filename, "w") as file:
         json.dump(list(new_job_keys), file)
 
     return new_job_keys
 
-def formatCreateDate(create_date: str) -> str:
-    formatted_date = int(create_date) / 1000
-    date = datetime.fromtimestamp(formatted_date)
-    formatted_date = date.strftime('%Y-%m-%d %H:%M:%S %Z')
-
-    return formatted_date
-
-async def create_report(new_keys: Set[str], config: ScrappingJobConfig):    
-    report_filename = f"{config.directory}/{config.query}_{config.location}_report.json"
-    full_scrap_filename = f"{config.directory}/{config.query}_{config.location}_final_results.json"
-    report = []
-    job_characteristics = OrderedSet([
-        "applyCount",
-        "company",
-        "companyRating",
-        "companyReviewCount",
-        "createDate",
-        "displayTitle",
-        "estimatedSalary",
-        "extractedSalary",
-        "expired",
-        "employerResponsive",
-        "formattedLocation",
-        "formattedRelativeTime",
-        "hiringMultipleCandidatesModel",
-        "jobCardRequirementsModel",
-        "jobkey",
-        "link",
-        "newJob",
-        "organicApplyStartCount",
-        "pubDate",
-        "remoteLocation",
-        "remoteWorkModel",
-        "taxonomyAttributes",
-        "title",
-        "salarySnippet",
-        "urgentlyHiring"
-    ])
-
-    with open(full_scrap_filename, "r") as file:
-        full_scrap = json.load(file)
-
-    # TODO: Can this be refactored?
-    for job_key, job_description in full_scrap.items():
-        if job_key in new_keys:
-            job_report = {}
-            for key in job_characteristics:
-                if key in job_description:
-                    job_report[key] = job_description[key]
-                    # if key == "link":
-                    #     description = await scrap_description_link(job_description[key])
-                    #     job_report["jobDescription"] = description
-                    if key == "createDate":
-                        formattedCreateDate = formatCreateDate(job_description[key])
-                        job_report["formattedCreateDate"] = formattedCreateDate
-                    if key == "pubDate":
-                        formattedCreateDate = formatCreateDate(job_description[key])
-                        job_report["formattedPubDate"] = formattedCreateDate
-                else:
-                    job_report[key] = "Not provided"
-
-            # if DockerEnvironment.is_running_in_docker():
-            #     save_job_to_redis(job_key, job_report)
-
-            report.append(job_report)
-    
+async def migrate_old_job_keys(config: ScrappingJobConfig, seen_jobs_key: str):
+    # Job keys used to be kept in {location}_jobkeys_old.json. They are added to the Redis index once, so
+    # the first run after upgrading doesn't report (and fetch the description of) every current job as new.
+    # The file is shared by every query of the location, so it is left in place for the other searches. The
+    # global index is seeded once from the file of each location.
+    if (seen_jobs_key, config.location) in migrated_seen_jobs_keys:
+        return
+    old_jobkeys_filename = f"{config.directory}/{config.location}_jobkeys_old.json"
+    if os.path.exists(old_jobkeys_filename):
+        with open(old_jobkeys_filename, "r") as file:
+            old_job_keys = json.load(file)
+        if await seed_seen_jobs(seen_jobs_key, config.location, old_job_keys, config.seen_jobs_max_age_days):
+            logger.info(f"Added {len(old_job_keys)} job keys from {old_jobkeys_filename} to {seen_jobs_key}")
+    migrated_seen_jobs_keys.add((seen_jobs_key, config.location))
+
+async def create_report(new_keys: Set[str], results: Dict, config: ScrappingJobConfig) -> Dict[str, Dict]:
+    # The report is built straight from the in-memory results of the scrape, so nothing is read back from
+    # disk. The reports of the new jobs are returned so the scheduler can save them to Redis together with
+    # the rest of the search state. They are written by write_report once keyword alerts are matched.
+    new_job_reports = {}
+
+    # Pages and shards finish in any order, so the newest jobs are put first by their creation date
+    new_jobs = sorted(
+        ((job_key, job) for job_key, job in results.items() if job_key in new_keys),
+        key=lambda item: int(item[1].get("createDate") or 0), reverse=True
+    )
+
+    descriptions = {}
+    if config.fetch_descriptions:
+        links = {job_key: job.get("link") for job_key, job in new_jobs if job.get("link") is not None}
+        descriptions = await fetch_job_descriptions(links, config)
+
+    for job_key, job in new_jobs:
+        job_report = job.to_report()
+        if job_key in descriptions:
+            job_report["jobDescription"] = descriptions[job_key]
+        new_job_reports[job_key] = job_report
+
+    return new_job_reports
+
+def write_report(new_job_reports: Dict[str, Dict], config: ScrappingJobConfig):
+    # One job per line (NDJSON)
+    report_filename = f"{config.directory}/{config.query}_{config.location}_report.ndjson"
     with open(report_filename, "w") as file:
-        json.dump(report, file)
+        for job_report in new_job_reports.values():
+            file.write(json.dumps(job_report) + "\n")
+
+async def index_new_jobs(new_job_reports: Dict[str, Dict], config: ScrappingJobConfig) -> Dict[str, List[str]]:
+    # Adds the descriptions of the new jobs to the full-text index and returns the job keys matching each keyword alert
+    job_store = get_job_store(config.job_store_path)
+    # Failed descriptions are not indexed, like they are not cached
+    descriptions = {
+        job_key: job_report["jobDescription"] for job_key, job_report in new_job_reports.items()
+        if job_report.get("jobDescription", DESCRIPTION_ERROR) not in (DESCRIPTION_NOT_AVAILABLE, DESCRIPTION_ERROR)
+    }
+    await asyncio.to_thread(job_store.save_descriptions, descriptions)
+    # Keyword alerts are only checked against the new jobs
+    return await asyncio.to_thread(job_store.match_alerts, list(new_job_reports))
+
+async def fetch_job_descriptions(links: Dict[str, str], config: ScrappingJobConfig) -> Dict[str, str]:
+    # Only new jobs get here. Descriptions are cached by job key, so a job found again by another search
+    # or reposted under the same key is never fetched twice. The rest are fetched concurrently, at most
+    # description_concurrency at a time for this search (fetch_page also applies the global page limit).
+    try:
+        descriptions = await get_cached_job_descriptions(list(links))
+    except Exception as e:
+        # The new jobs are already marked as seen, so the report must not fail on the cache
+        logger.error(f"Could not read the description cache, fetching every description: {e}")
+        descriptions = {}
+    missing_links = {job_key: link for job_key, link in links.items() if job_key not in descriptions}
+    logger.info(f"Job descriptions: {len(descriptions)} cached, {len(missing_links)} to fetch")
+
+    semaphore = asyncio.Semaphore(config.description_concurrency)
+
+    async def fetch_description(link: str) -> str:
+        async with semaphore:
+            return await scrap_description_link(link, config)
+
+    fetched = await asyncio.gather(*(fetch_description(link) for link in missing_links.values()))
+    fetched_descriptions = dict(zip(missing_links, fetched))
+    descriptions.update(fetched_descriptions)
+
+    # Failures are reported as is but not cached, so they are retried if the job is found again
+    try:
+        await set_cached_job_descriptions(
+            {job_key: description for job_key, description in fetched_descriptions.items()
+             if description not in (DESCRIPTION_NOT_AVAILABLE, DESCRIPTION_ERROR)},
+            config.description_cache_ttl_days * 24 * 60 * 60,
+        )
+    except Exception as e:
+        logger.error(f"Could not cache the job descriptions: {e}")
+    return descriptions
 
-async def scrap_description_link(link: str) -> str:
+async def scrap_description_link(link: str, config: ScrappingJobConfig) -> str:
     url = "https://www.indeed.com" + link
     try:
-        result = await scrapfly.async_scrape(ScrapeConfig(url, asp=True))
+        result = await fetch_page_with_retry(url, config)
         target_div = result.selector.css('div#jobDescriptionText')
         
         if target_div:
@@ -253,10 +913,10 @@ async def scrap_description_link(link: str) -> str:
             return clean_job_description(description_parts)
         else:
             logger.warning(f"Div not found for link: {link}")
-            return "Job description not available."
+            return DESCRIPTION_NOT_AVAILABLE
     except Exception as e:
         logger.error(f"Error in scrap_description_link (scrapper.py) for link '{link}': {e}")
-        return "Error retrieving job description."
+        return DESCRIPTION_ERROR
 
 def clean_job_description(description_parts: List[str]) -> str:
     return ' '.join(description_parts).replace("\n", "").replace("\u2019", "'").strip()
\ No newline at end of file
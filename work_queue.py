@@ -0,0 +1,212 @@
+import os
+import time
+import random
+import socket
+import asyncio
+
+from colorama import Fore
+from logging_config import app_logger
+from scrapper import configure_page_concurrency, configure_parse_workers, shutdown_parse_workers
+from redis_utils import get_searches_to_scrape, get_search_rates, async_redis_connection, ensure_consumer_group, \
+    publish_scrape_job, read_scrape_jobs, claim_stale_scrape_jobs, renew_scrape_job_lease, ack_scrape_job, \
+    set_scrape_job_result, get_scrape_job_result
+from metrics import start_metrics_server
+from adaptive_schedule import AdaptiveSchedule
+from scheduler import run_scheduled_search, SCHEDULE_POLL_SECONDS, DEFAULT_MAX_INTERVAL_MINUTES
+
+logger = app_logger.getChild('work_queue')
+
+# Distributed mode: one coordinator decides when each search is due and publishes it to a Redis stream,
+# any number of stateless workers (on any machine sharing the Redis) read the stream in a consumer group,
+# scrape and acknowledge. A job stays pending for its worker while the worker renews its lease; when a
+# worker crashes its leases expire and another worker claims the jobs with XAUTOCLAIM.
+SCRAPE_JOBS_STREAM = "scrape_jobs"
+SCRAPE_WORKERS_GROUP = "scrape_workers"
+SCRAPE_JOBS_STREAM_MAX_LENGTH = 10_000
+SCRAPE_JOB_LEASE_SECONDS = 120
+# How long a worker waits on the stream before checking for stale jobs again
+WORKER_BLOCK_SECONDS = 5
+DEFAULT_WORKER_SCRAPES = 4
+# A published search that has not finished after this long is published again, e.g. when its
+# stream entry was trimmed before any worker read it
+SCRAPE_JOB_TIMEOUT_SECONDS = 60 * 60
+# Workers record whether each job finished or failed under its message id, for the coordinator to read back
+SCRAPE_JOB_DONE = "done"
+SCRAPE_JOB_FAILED = "failed"
+SCRAPE_JOB_RESULT_TTL_SECONDS = 24 * 60 * 60
+
+async def run_coordinator(scrape_tasks, run_every_minutes, scraps_staggering_minutes, metrics_port=None,
+                          max_interval_minutes=DEFAULT_MAX_INTERVAL_MINUTES, target_new_jobs_per_run=1.0,
+                          credit_budget_per_hour=None):
+    # Same schedule as run_schedule, but due searches are published instead of scraped. The posting
+    # rates are written by the workers, so they are read back from Redis whenever a search is due.
+    from gui import gui_queue, start_gui_thread, stop_gui_thread
+    start_gui_thread()
+    if metrics_port is not None:
+        await start_metrics_server(metrics_port)
+
+    min_interval_seconds = run_every_minutes * 60
+    schedule = AdaptiveSchedule(min_interval_seconds, max_interval_minutes * 60, target_new_jobs_per_run, credit_budget_per_hour)
+    # Time and message id of each published search, until a worker finishes it
+    published_searches = {}
+
+    try:
+        await ensure_consumer_group(SCRAPE_JOBS_STREAM, SCRAPE_WORKERS_GROUP)
+        # The first run of each search is spread over the staggering window, like in run_schedule
+        now = time.time()
+        for search in scrape_tasks:
+            schedule.schedule_at(search, now + random.uniform(0, scraps_staggering_minutes * 60))
+
+        while True:
+            due_searches = schedule.pop_due(time.time())
+            if due_searches:
+                try:
+                    searches_to_scrape = await get_searches_to_scrape(due_searches, 0)
+                    search_rates = await get_search_rates(due_searches)
+                except Exception as e:
+                    logger.error(Fore.RED + f"Could not read the state of the searches: {e}")
+                    for search in due_searches:
+                        schedule.schedule_at(search, time.time() + SCHEDULE_POLL_SECONDS)
+                    searches_to_scrape, search_rates = {}, {}
+
+                for search, (rate, cost, last_run) in search_rates.items():
+                    schedule.load(search, rate, cost, last_run)
+                    await dispatch_search(search, searches_to_scrape[search], schedule, published_searches,
+                                          min_interval_seconds, scraps_staggering_minutes, gui_queue)
+
+            seconds_until_next = schedule.seconds_until_next(time.time())
+            await asyncio.sleep(SCHEDULE_POLL_SECONDS if seconds_until_next is None else min(seconds_until_next, SCHEDULE_POLL_SECONDS))
+    finally:
+        stop_gui_thread()
+        await async_redis_connection.close()
+
+async def dispatch_search(search, should_scrape, schedule, published_searches, min_interval_seconds,
+                          scraps_staggering_minutes, gui_queue):
+    query, location = search
+    now = time.time()
+    published = published_searches.get(search)
+
+    if published is not None:
+        published_at, message_id = published
+        try:
+            result = await get_scrape_job_result(message_id)
+        except Exception as e:
+            logger.error(Fore.RED + f"Could not read the result of the scrape job for {query} in {location}: {e}")
+            schedule.schedule_at(search, now + SCHEDULE_POLL_SECONDS)
+            return
+        if result is None and now - published_at < SCRAPE_JOB_TIMEOUT_SECONDS:
+            schedule.schedule_at(search, now + SCHEDULE_POLL_SECONDS)
+            return
+        del published_searches[search]
+        if result == SCRAPE_JOB_DONE:
+            if not should_scrape:
+                # The run found new jobs, which are not viewed yet
+                gui_queue.put((f"New jobs found", f"New jobs found for {query} in {location}", query, location, scraps_staggering_minutes))
+            schedule.schedule_at(search, now + schedule.interval(search))
+            return
+        if result == SCRAPE_JOB_FAILED:
+            # Retried after the minimum interval, like a failed search of the local scheduler
+            logger.warning(Fore.RED + f"Scrape job for {query} in {location} failed, publishing it again in {min_interval_seconds} seconds")
+            schedule.schedule_at(search, now + min_interval_seconds)
+            return
+        logger.warning(Fore.RED + f"Scrape job for {query} in {location} did not finish in time, publishing it again")
+
+    if should_scrape:
+        message_id = await publish_scrape_job(SCRAPE_JOBS_STREAM, query, location, SCRAPE_JOBS_STREAM_MAX_LENGTH)
+        published_searches[search] = (now, message_id)
+        logger.info(Fore.MAGENTA + f"Published scrape job for {query} in {location}")
+        # Checked until a worker finishes it
+        schedule.schedule_at(search, now + SCHEDULE_POLL_SECONDS)
+    else:
+        logger.debug(Fore.MAGENTA + f"Skipping scrape for {query} in {location}")
+        schedule.schedule_at(search, now + min_interval_seconds)
+
+async def run_worker(consumer_name=None, max_concurrent_scrapes=DEFAULT_WORKER_SCRAPES, max_concurrent_pages=None,
+                     parse_workers=None, metrics_port=None):
+    # Workers keep no state of their own: everything a run needs is read from Redis, so they can be
+    # started and stopped at any time
+    consumer = consumer_name or f"{socket.gethostname()}-{os.getpid()}"
+    if metrics_port is not None:
+        await start_metrics_server(metrics_port)
+    await configure_page_concurrency(max_concurrent_pages)
+    configure_parse_workers(parse_workers)
+
+    scrape_slots = asyncio.Semaphore(max_concurrent_scrapes)
+    running_jobs = set()
+    logger.info(f"Worker {consumer} started, running up to {max_concurrent_scrapes} searches at once")
+
+    try:
+        await ensure_consumer_group(SCRAPE_JOBS_STREAM, SCRAPE_WORKERS_GROUP)
+        while True:
+            await scrape_slots.acquire()
+            try:
+                # Jobs abandoned by crashed workers go first
+                jobs = await claim_stale_scrape_jobs(SCRAPE_JOBS_STREAM, SCRAPE_WORKERS_GROUP, consumer,
+                                                     SCRAPE_JOB_LEASE_SECONDS * 1000, 1)
+                if not jobs:
+                    jobs = await read_scrape_jobs(SCRAPE_JOBS_STREAM, SCRAPE_WORKERS_GROUP, consumer, 1,
+                                                  WORKER_BLOCK_SECONDS * 1000)
+            except Exception as e:
+                logger.error(Fore.RED + f"Could not read scrape jobs: {e}")
+                jobs = []
+                await asyncio.sleep(WORKER_BLOCK_SECONDS)
+
+            if not jobs:
+                scrape_slots.release()
+                continue
+
+            task = asyncio.create_task(process_scrape_job(consumer, *jobs[0]))
+            running_jobs.add(task)
+            task.add_done_callback(running_jobs.discard)
+            task.add_done_callback(lambda _: scrape_slots.release())
+    finally:
+        # Unacknowledged jobs are claimed by another worker once their lease expires
+        for task in running_jobs:
+            task.cancel()
+        shutdown_parse_workers()
+        await async_redis_connection.close()
+
+async def process_scrape_job(consumer, message_id, query, location):
+    search = (query, location)
+    lease = asyncio.create_task(keep_lease(consumer, message_id))
+    status = SCRAPE_JOB_DONE
+    try:
+        logger.info(Fore.MAGENTA + f"Worker {consumer} performing scrape for {query} in {location}")
+        rate, _, last_run = (await get_search_rates([search]))[search]
+        await run_scheduled_search(query, location, rate, last_run)
+    except Exception as e:
+        # The job is still acknowledged, the coordinator sees the failed result and publishes the search again
+        logger.error(Fore.RED + f"Scrape job failed for {query} in {location}: {e}")
+        status = SCRAPE_JOB_FAILED
+    finally:
+        lease.cancel()
+
+    try:
+        await set_scrape_job_result(message_id, status, SCRAPE_JOB_RESULT_TTL_SECONDS)
+    except Exception as e:
+        # The coordinator publishes the search again once SCRAPE_JOB_TIMEOUT_SECONDS have passed
+        logger.error(Fore.RED + f"Could not save the result of the scrape job for {query} in {location}: {e}")
+
+    try:
+        await ack_scrape_job(SCRAPE_JOBS_STREAM, SCRAPE_WORKERS_GROUP, message_id)
+    except Exception as e:
+        logger.error(Fore.RED + f"Could not acknowledge the scrape job for {query} in {location}: {e}")
+
+async def keep_lease(consumer, message_id):
+    while True:
+        await asyncio.sleep(SCRAPE_JOB_LEASE_SECONDS / 3)
+        try:
+            if not await renew_scrape_job_lease(SCRAPE_JOBS_STREAM, SCRAPE_WORKERS_GROUP, consumer, message_id):
+                logger.warning(Fore.RED + f"Lease of scrape job {message_id} was lost to another worker")
+                return
+        except Exception as e:
+            logger.error(Fore.RED + f"Could not renew the lease of scrape job {message_id}: {e}")
+
+def start_coordinator(scrape_tasks, run_every_minutes, scraps_staggering_minutes, metrics_port=None,
+                      max_interval_minutes=DEFAULT_MAX_INTERVAL_MINUTES, target_new_jobs_per_run=1.0, credit_budget_per_hour=None):
+    asyncio.run(run_coordinator(scrape_tasks, run_every_minutes, scraps_staggering_minutes, metrics_port,
+                                max_interval_minutes, target_new_jobs_per_run, credit_budget_per_hour))
+
+def start_worker(consumer_name=None, max_concurrent_scrapes=DEFAULT_WORKER_SCRAPES, max_concurrent_pages=None,
+                 parse_workers=None, metrics_port=None):
+    asyncio.run(run_worker(consumer_name, max_concurrent_scrapes, max_concurrent_pages, parse_workers, metrics_port))